@@ -0,0 +1,148 @@
+"""
+Persistent article store for the daily digest.
+
+A small SQLite database, keyed by canonical URL, of every article the digest
+has collected: title, source, summary, publish time, and when we first saw
+it. fetch_articles() dedupes within a run; the store dedupes across runs, so
+a story published late yesterday (the fetch window is over a day long) isn't sent to
+GPT-4o a second time today.
+
+Looking up and recording are separate steps: filter_new() only reads, and
+record_published() writes a run's articles once its digest has been
+published. A day whose run fails never marks its articles as seen, so the
+next day's digest still gets them.
+
+Canonical URLs drop the fragment, tracking parameters (utm_*, fbclid, ...)
+and trailing slashes, and unwrap Google News article links to the publisher
+URL they point at, so the same story from two feeds shares one key. The
+canonical form is only a key: articles keep the publisher's link in "url"
+for readers, with the key alongside in "canonical_url".
+
+The file doubles as a history of what the digest has seen:
+    sqlite3 .cache/digest/articles.sqlite3 \
+        "SELECT digest_date, source, title FROM articles ORDER BY first_seen DESC LIMIT 20"
+"""
+
+import base64
+import re
+import sqlite3
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,          -- canonical URL
+    title TEXT NOT NULL,
+    source TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    published TEXT NOT NULL DEFAULT '',
+    first_seen TEXT NOT NULL,      -- ISO timestamp of the run that first published it
+    digest_date TEXT NOT NULL,     -- YYYY-MM-DD digest it first appeared in
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_first_seen ON articles(first_seen);
+CREATE INDEX IF NOT EXISTS idx_articles_digest_date ON articles(digest_date);
+"""
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "_hsenc", "_hsmi",
+    "ref", "ref_src", "ref_url", "cmpid", "ocid", "smid", "sr_share", "guccounter",
+    "guce_referrer", "guce_referrer_sig", "taid", "mbid", "spm", "ncid", "src", "oc",
+}
+TRACKING_PREFIXES = ("utm_", "itm_", "pk_", "mtm_")
+
+
+# --- Canonical URLs ---
+
+def _google_news_target(url):
+    """Publisher URL inside a news.google.com/rss/articles/<id> link, or None.
+
+    Older article ids are base64-encoded protobuf with the URL embedded as a
+    length-prefixed string. Newer ids ("AU_yqL...") are opaque and need
+    Google's JavaScript to resolve, so those are left as-is.
+    """
+    m = re.search(r"/articles/([A-Za-z0-9_-]+)", urlsplit(url).path)
+    if not m:
+        return None
+    token = m.group(1)
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        return None
+    found = re.search(rb"https?://", raw)
+    if not found:
+        return None
+    start = found.start()
+    length = raw[start - 1] if start else 0  # single-byte varint length prefix
+    if start >= 2 and raw[start - 1] & 0x80 == 0 and raw[start - 2] & 0x80:
+        length = (raw[start - 2] & 0x7F) | (raw[start - 1] << 7)  # two-byte varint
+    candidate = raw[start:start + length] if length else b""
+    if not re.fullmatch(rb"https?://[\x21-\x7e]+", candidate):
+        tail = re.match(rb"https?://[\x21-\x7e]+", raw[start:])
+        candidate = tail.group(0) if tail else b""
+    return candidate.decode("ascii") if candidate else None
+
+
+def canonical_url(url):
+    """Normalize a link so the same article always maps to the same key."""
+    url = (url or "").strip()
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host == "news.google.com":
+        target = _google_news_target(url)
+        if target:
+            return canonical_url(target)
+
+    netloc = host
+    if parts.port and not (parts.scheme == "http" and parts.port == 80) and not (parts.scheme == "https" and parts.port == 443):
+        netloc = f"{host}:{parts.port}"
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    path = parts.path
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), netloc, path, urlencode(sorted(query)), ""))
+
+
+# --- Store ---
+
+def open_store(path):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _key(article):
+    return article.get("canonical_url") or canonical_url(article["url"])
+
+
+def filter_new(conn, articles, digest_date):
+    """Return the articles not already published in an earlier digest.
+
+    Articles published in digest_date's own digest still count as new, so
+    re-running the same day's digest gets the same input back. Read-only:
+    see record_published().
+    """
+    fresh = []
+    for a in articles:
+        row = conn.execute("SELECT digest_date FROM articles WHERE url = ?", (_key(a),)).fetchone()
+        if row is None or row[0] == digest_date:
+            fresh.append(a)
+    return fresh
+
+
+def record_published(conn, articles, digest_date, seen_at):
+    """Record the articles that went into digest_date's published digest."""
+    with conn:
+        for a in articles:
+            conn.execute(
+                "INSERT INTO articles (url, title, source, summary, published, first_seen, digest_date, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET last_seen = excluded.last_seen",
+                (_key(a), a["title"], a["source"], a["summary"], a["published"], seen_at, digest_date, seen_at),
+            )
@@ -0,0 +1,29 @@
+"""
+Atomic file writes for the caches, checkpoints, queues and pages the scripts
+rewrite in place.
+
+A run can be killed at any point (a job timeout, a cancelled workflow), and
+the next run reads these files back. write() puts the data in a temp file
+next to the target and os.replace()s it over, so a reader sees the old file
+or the new one, never half of either.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+
+def write(path, data):
+    """Atomically replace path with data (str, written as UTF-8, or bytes),
+    creating the parent directory. OSError is left to the caller."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")  # per thread: writers can share a target
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        raise
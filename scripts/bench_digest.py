@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the digest pipeline.
+
+Runs generate_digest's stages against a local stand-in for the RSS feeds and
+a fake OpenAI server, so performance changes can be measured without the
+network or an API key. Each scale multiplies the configured feed list (1x is
+today's len(RSS_FEEDS)) and reports wall time per stage:
+
+    fetch    fetch_articles(): HTTP + parse + collect, cold feed cache, per-host
+             limits applied across one local server (host:port) per publisher
+    parse    feedparser over every served body, sequentially (CPU only)
+    curate   clustering, prefilter, prompt packing and the (fake) GPT-4o call(s)
+    render   digest body + post page
+    index    index page + current archive month
+
+Feed bodies come from recorded fixtures (--fixtures DIR, as written by
+--record DIR) or are synthesized. Either way each served copy gets unique
+links and fresh publish dates, so dedupe and the fetch window behave as they
+would on a real day. All output goes to a temporary directory; nothing in
+the repo is touched.
+
+Usage:
+    python scripts/bench_digest.py                       # 1x, 10x, 100x
+    python scripts/bench_digest.py --scales 1,10 --llm-latency 4 --feed-latency 0.3
+    python scripts/bench_digest.py --record scripts/bench_fixtures   # capture live feeds once
+    python scripts/bench_digest.py --fixtures scripts/bench_fixtures --json bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import feedparser
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent))
+import generate_digest as gd
+import host_scheduler
+
+BASE_FEEDS = list(gd.RSS_FEEDS)
+# Module-level paths as generate_digest defines them, before sandbox() moves them
+REPO_PATHS = {name: value for name, value in vars(gd).items() if isinstance(value, Path) and name != "REPO_ROOT"}
+
+logger = logging.getLogger("bench")
+
+STAGES = ["fetch", "parse", "curate", "render", "index"]
+WORDS = (
+    "startup raises seed series funding round led investors launches model agent platform health "
+    "wearable sleep ring glucose longevity clinic fda cleared partnership acquires chips inference "
+    "cloud data open source policy regulation valuation billion million stealth founders"
+).split()
+
+
+# --- Fixtures ---
+
+def synthetic_feed(n_entries, rng):
+    items = []
+    for i in range(n_entries):
+        title = " ".join(rng.choice(WORDS) for _ in range(8)).capitalize()
+        summary = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 160)))
+        items.append(
+            f"<item><title>{title}</title><link>https://example.com/story/{i}</link>"
+            f"<description>&lt;p&gt;{summary}&lt;/p&gt;</description><pubDate>PUBDATE</pubDate></item>"
+        )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Bench</title>{"".join(items)}</channel></rss>'
+
+
+def load_fixtures(fixtures_dir, n_entries):
+    if fixtures_dir:
+        bodies = [p.read_text(encoding="utf-8", errors="replace") for p in sorted(Path(fixtures_dir).glob("*.xml"))]
+        if not bodies:
+            sys.exit(f"No *.xml fixtures in {fixtures_dir}")
+        return bodies
+    rng = random.Random(42)
+    return [synthetic_feed(n_entries, rng) for _ in range(len(gd.RSS_FEEDS))]
+
+
+def record_fixtures(out_dir):
+    """Save one live copy of every configured feed as a replayable fixture."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    for i, fc in enumerate(gd.RSS_FEEDS):
+        try:
+            resp = requests.get(fc["url"], headers={"User-Agent": gd.FEED_USER_AGENT}, timeout=30)
+            resp.raise_for_status()
+            (out / f"{i:03d}.xml").write_bytes(resp.content)
+            logger.info(f"Recorded {fc['name']} ({len(resp.content)} bytes)")
+        except Exception as e:
+            logger.warning(f"Could not record {fc['name']}: {e}")
+
+
+def personalize(body, copy):
+    """Give a served copy unique links and publish dates inside today's window."""
+    now = datetime.now(timezone.utc)
+    rfc822 = format_datetime(now - timedelta(hours=1))
+    iso = (now - timedelta(hours=1)).isoformat()
+    body = body.replace("PUBDATE", rfc822)
+    body = re.sub(r"<pubDate>[^<]*</pubDate>", f"<pubDate>{rfc822}</pubDate>", body)
+    body = re.sub(r"<(updated|published)>[^<]*</\1>", rf"<\1>{iso}</\1>", body)
+
+    def tag(url):
+        return f"{url}{'&' if '?' in url else '?'}bench={copy}"
+
+    body = re.sub(r"<link>\s*([^<\s]+)\s*</link>", lambda m: f"<link>{tag(m.group(1))}</link>", body)
+    body = re.sub(r'(<link[^>]*href=")([^"]+)(")', lambda m: m.group(1) + tag(m.group(2)) + m.group(3), body)
+    return body.encode("utf-8")
+
+
+# --- Local servers ---
+
+def canned_digest(prompt, indexed=False):
+    """A plausible curation response built from the prompt's article list,
+    citing article numbers or copying URLs depending on the output format."""
+    urls = re.findall(r"URL: (\S+)", prompt) or ["https://example.com/"]
+    count = len(re.findall(r"^\d+\. ", prompt, re.M)) or 1
+
+    def ref(i):
+        if indexed:
+            return i % count + 1
+        return {"title": f"Story {i}", "url": urls[i % len(urls)], "source": "Bench"}
+
+    def bullet(i):
+        if indexed:
+            return {"text": f"Company {i} — something happened", "article": i % count + 1}
+        return {"text": f"Company {i} — something happened", "url": urls[i % len(urls)], "source": "Bench"}
+
+    return {
+        "top_story": {"title": "Benchmark top story", "summary": "Lorem ipsum. " * 4, "articles": [ref(0), ref(1)]},
+        "funding_rounds": [bullet(i) for i in range(2, 7)],
+        "product_launches": [bullet(i) for i in range(7, 11)],
+        "stealth_launches": [bullet(11)],
+        "health_tech": [bullet(i) for i in range(12, 15)],
+        "sections": [
+            {"title": f"Section {s}", "summary": "Lorem ipsum. " * 3, "articles": [ref(15 + s), ref(20 + s)]}
+            for s in range(3)
+        ],
+    }
+
+
+def canned_screen(prompt):
+    """A plausible map-step response: keep every third numbered article."""
+    ids = [int(n) for n in re.findall(r"^(\d+)\. ", prompt, re.M)]
+    categories = ["funding_rounds", "product_launches", "health_tech", "other"]
+    return {"items": [
+        {"id": n, "category": categories[n % len(categories)], "importance": 1 + n % 5, "note": f"Company {n} — something happened"}
+        for n in ids if n % 3 == 1
+    ]}
+
+
+def start_server(served, feed_latency, llm_latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            m = re.fullmatch(r"/feed/(\d+)", self.path)
+            if not m or int(m.group(1)) >= len(served):
+                return self._send(404, b"not found", "text/plain")
+            time.sleep(feed_latency)
+            self._send(200, served[int(m.group(1))], "application/rss+xml")
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            time.sleep(llm_latency)
+            messages = req.get("messages", [{}])
+            prompt = messages[-1].get("content", "")
+            system = messages[0].get("content")
+            if system == gd.MAP_SYSTEM_PROMPT:
+                content = json.dumps(canned_screen(prompt))
+            else:
+                content = json.dumps(canned_digest(prompt, indexed=system == gd.INDEXED_SYSTEM_PROMPT))
+            body = json.dumps({
+                "id": "bench", "object": "chat.completion", "created": int(time.time()), "model": req.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (len(prompt) + len(content)) // 4},
+            }).encode("utf-8")
+            self._send(200, body, "application/json")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- Sandbox ---
+
+def sandbox(root):
+    """Point every repo path generate_digest writes to (posts, index, caches,
+    the Jinja bytecode cache) at a scratch directory. Seeds the archive manifest so the index stage does
+    realistic work."""
+    for name, value in REPO_PATHS.items():
+        try:
+            setattr(gd, name, root / value.relative_to(gd.REPO_ROOT))
+        except ValueError:
+            pass
+    gd.JINJA_ENV = gd._jinja_env()  # built at import against the repo's bytecode cache
+    real_manifest = Path(__file__).parent.parent / "digest" / "archive.json"
+    if real_manifest.exists():
+        gd.MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(real_manifest, gd.MANIFEST_PATH)
+
+
+# --- Benchmark ---
+
+def run_scale(scale, fixtures, args):
+    base_feeds = BASE_FEEDS
+    n_feeds = len(base_feeds) * scale
+    served = [personalize(fixtures[i % len(fixtures)], i) for i in range(n_feeds)]
+
+    # One server per publisher, each on its own port of 127.0.0.1 (the only
+    # loopback address macOS configures), so per-host limits, which key on
+    # host:port, apply as they would live: by default the real feeds' hosts,
+    # each copy on its original's host.
+    real_hosts = list(dict.fromkeys(host_scheduler.host_of(fc["url"]) for fc in base_feeds))
+    n_hosts = args.hosts or len(real_hosts)
+
+    def host_index(i):
+        if args.hosts:
+            return i % n_hosts
+        return real_hosts.index(host_scheduler.host_of(base_feeds[i % len(base_feeds)]["url"]))
+
+    servers = [start_server(served, args.feed_latency, args.llm_latency) for _ in range(n_hosts)]
+    hosts = [f"http://{srv.server_address[0]}:{srv.server_port}" for srv in servers]
+    os.environ["OPENAI_BASE_URL"] = f"{hosts[0]}/v1"
+    os.environ["OPENAI_API_KEY"] = "bench"  # never send a real key, even to localhost
+    gd.RSS_FEEDS[:] = [
+        {**base_feeds[i % len(base_feeds)], "url": f"{hosts[host_index(i)]}/feed/{i}", "name": f"{base_feeds[i % len(base_feeds)]['name']} #{i}"}
+        for i in range(n_feeds)
+    ]
+    if args.deadline:
+        gd.FETCH_DEADLINE_SECONDS = args.deadline
+    gd.CURATION_OUTPUT = args.output
+
+    timings = {}
+    with tempfile.TemporaryDirectory(prefix="digest-bench-") as tmp:
+        sandbox(Path(tmp))
+        today = datetime.now(timezone.utc)
+
+        t = time.perf_counter()
+        articles = gd.fetch_articles()
+        timings["fetch"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        for body in served:
+            feedparser.parse(body)
+        timings["parse"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        digest_data = gd.curate_with_gpt(gd.prefilter_stories(gd.group_stories(articles)), use_cache=False, mode=args.curation_mode)
+        timings["curate"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        digest_html = gd.render_digest_body(digest_data, today)
+        gd.generate_post_html(digest_data, today, digest_html)
+        timings["render"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        gd.update_index(digest_html, today)
+        timings["index"] = time.perf_counter() - t
+
+    for srv in servers:
+        srv.shutdown()
+    return {"scale": scale, "feeds": n_feeds, "hosts": n_hosts, "articles": len(articles), "seconds": timings}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Offline benchmark for generate_digest.py")
+    p.add_argument("--scales", default="1,10,100", help="comma-separated multiples of len(RSS_FEEDS)")
+    p.add_argument("--fixtures", default=None, help="directory of recorded *.xml feeds (default: synthetic)")
+    p.add_argument("--record", default=None, metavar="DIR", help="record the live feeds into DIR and exit")
+    p.add_argument("--entries-per-feed", type=int, default=20, help="entries per synthetic feed")
+    p.add_argument("--feed-latency", type=float, default=0.05, help="seconds the feed server waits per request")
+    p.add_argument("--llm-latency", type=float, default=1.0, help="seconds the fake OpenAI server waits per call")
+    p.add_argument("--curation-mode", choices=["single", "map-reduce"], default=gd.CURATION_MODE)
+    p.add_argument("--output", choices=["indexed", "full"], default=gd.CURATION_OUTPUT, help="curation output format")
+    p.add_argument("--hosts", type=int, default=0,
+                   help="spread feeds over this many fake hosts (default: one per real feed host)")
+    p.add_argument("--deadline", type=float, default=None, help="override FETCH_DEADLINE_SECONDS")
+    p.add_argument("--json", default=None, metavar="FILE", help="also write results as JSON")
+    p.add_argument("--verbose", action="store_true", help="keep generate_digest's INFO logging")
+    args = p.parse_args()
+
+    if args.record:
+        record_fixtures(args.record)
+        return
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    fixtures = load_fixtures(args.fixtures, args.entries_per_feed)
+    results = [run_scale(int(s), fixtures, args) for s in args.scales.split(",")]
+
+    print(f"{'scale':>6} {'feeds':>6} {'hosts':>6} {'articles':>9} " + " ".join(f"{s:>8}" for s in STAGES) + f" {'total':>8}")
+    for r in results:
+        secs = r["seconds"]
+        print(
+            f"{str(r['scale']) + 'x':>6} {r['feeds']:>6} {r['hosts']:>6} {r['articles']:>9} "
+            + " ".join(f"{secs[s]:>7.2f}s" for s in STAGES)
+            + f" {sum(secs.values()):>7.2f}s"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
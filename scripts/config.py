@@ -79,8 +79,180 @@ RSS_FEEDS = [
 # bounded — the Google News health search can return many items per day.
 MAX_ARTICLES_PER_FEED = 20
 
-# GPT-4o system prompt for curation
-SYSTEM_PROMPT = """You are a concise, opinionated tech news curator writing a daily briefing for someone in finance who cares deeply about the AI, startup, and personal health tech ecosystems.
+# Feed fetching runs concurrently. Each feed gets FETCH_TIMEOUT_SECONDS for its
+# HTTP request; the whole fetch stage stops waiting after FETCH_DEADLINE_SECONDS
+# and any feed still outstanding is logged as skipped for the day.
+FETCH_WORKERS = 16
+FETCH_TIMEOUT_SECONDS = 20
+FETCH_DEADLINE_SECONDS = 45
+
+# Politeness: at most FETCH_PER_HOST requests in flight to any one host, and
+# at least FETCH_HOST_MIN_INTERVAL_SECONDS between starting them, so a long
+# feed list never bursts at one publisher. FETCH_HOST_LIMITS overrides both
+# per host as (max in flight, min interval). Feeds are started highest
+# priority first: a feed's "priority" key if set, else its SOURCE_PRIORITY.
+FETCH_PER_HOST = 4
+FETCH_HOST_MIN_INTERVAL_SECONDS = 0.25
+FETCH_HOST_LIMITS = {
+    "news.google.com": (2, 1.0),
+}
+FEED_USER_AGENT = "Mozilla/5.0 (compatible; JoshHouDigest/1.0; +https://joshhou.com/digest)"
+
+# Full-text enrichment (off by default; --enrich turns it on). Stories that
+# reach curation get the opening ENRICH_EXCERPT_TOKENS of their article page
+# added to the prompt. Pages are fetched ENRICH_WORKERS at a time, at most
+# ENRICH_PER_HOST from one site, and whatever isn't back within
+# ENRICH_TIME_BUDGET_SECONDS goes to the prompt without an excerpt. Hosts in
+# ENRICH_SKIP_HOSTS never serve article text to a script.
+ENRICH_ARTICLES = False
+ENRICH_WORKERS = 8
+ENRICH_PER_HOST = 2
+ENRICH_TIMEOUT_SECONDS = 10
+ENRICH_TIME_BUDGET_SECONDS = 30
+ENRICH_EXCERPT_TOKENS = 200
+ENRICH_SKIP_HOSTS = ["news.google.com"]
+
+# Circuit breaker. A feed that fails FEED_FAILURE_THRESHOLD runs in a row, or
+# answers with no entries at all for FEED_EMPTY_THRESHOLD runs, is skipped for
+# FEED_BACKOFF_BASE_HOURS, doubling each time it trips again up to
+# FEED_BACKOFF_MAX_HOURS. The base is a little under a day so a daily run
+# probes the feed again the next day rather than the one after. A feed with
+# entries but nothing new (a weekly blog, a 304) is healthy and never trips.
+# Empty feeds back off at most FEED_EMPTY_BACKOFF_MAX_HOURS, which must stay
+# under FETCH_WINDOW_HOURS so a post published while the feed is skipped is
+# still inside the window on the next fetch.
+FEED_FAILURE_THRESHOLD = 3
+FEED_EMPTY_THRESHOLD = 7
+FEED_BACKOFF_BASE_HOURS = 20
+FEED_BACKOFF_MAX_HOURS = 14 * 24
+FEED_EMPTY_BACKOFF_MAX_HOURS = 20
+
+# Articles published within this many hours are collected; a little over a
+# day so consecutive daily runs overlap (the article store drops repeats).
+FETCH_WINDOW_HOURS = 28
+
+# Articles whose title + summary overlap at least this much (estimated Jaccard
+# similarity of word shingles) are treated as one story and sent to GPT-4o once,
+# with every source URL attached. Lower merges more aggressively; below about
+# 0.5, parallel headlines ("Whoop raises $100M to ...", "Oura raises $200M to
+# ...") start to clear it. Pairs must also pass story_clusters' name and
+# amount check.
+CLUSTER_SIMILARITY_THRESHOLD = 0.5
+
+# The digest index shows the latest ARCHIVE_PAGE_SIZE posts; older ones are
+# reached through one archive page per month (digest/archive/YYYY-MM.html).
+ARCHIVE_PAGE_SIZE = 30
+
+# Prompt packing. The curation prompt is measured in tokens and capped at
+# PROMPT_TOKEN_BUDGET. Every summary is trimmed to SUMMARY_MAX_TOKENS; if the
+# batch is still over budget, the lowest-ranked stories are cut to
+# SUMMARY_MIN_TOKENS and then dropped. Ranking uses SOURCE_PRIORITY (default
+# 1.0), recency, and hits on PRIORITY_KEYWORDS, which mirror the PRIORITIES
+# in SYSTEM_PROMPT below.
+PROMPT_TOKEN_BUDGET = 16000
+SUMMARY_MAX_TOKENS = 120
+SUMMARY_MIN_TOKENS = 30
+
+SOURCE_PRIORITY = {
+    "TechCrunch AI": 1.5,
+    "TechCrunch Startups": 1.5,
+    "Crunchbase News": 1.5,
+    "Health Tech (Google News)": 1.4,
+    "OpenAI Blog": 1.3,
+    "Anthropic Blog": 1.3,
+    "Google AI Blog": 1.2,
+    "The Verge AI": 1.2,
+    "Rock Health": 1.2,
+    "Hacker News": 0.9,
+    "Fierce Healthcare": 0.8,
+    "STAT News": 0.8,
+}
+
+PRIORITY_KEYWORDS = [
+    # funding rounds
+    "raises", "raised", "funding", "seed", "series a", "series b", "series c", "valuation", "led by",
+    # launches and stealth
+    "launches", "launch", "unveils", "releases", "introduces", "out of stealth", "stealth",
+    # acquisitions, partnerships, people
+    "acquires", "acquisition", "partnership", "hires", "sam altman", "paul graham",
+    # personal health tech
+    "oura", "whoop", "eight sleep", "ultrahuman", "apple watch", "function health", "superpower",
+    "hone health", "levels", "wearable", "longevity", "fda",
+    # policy
+    "regulation", "policy",
+]
+
+# No-op runs. When every article left after dedupe was already in the input
+# of the last successful digest (a same-day re-run, or a day with nothing new),
+# the run stops after fetching: no GPT-4o call, no page writes, no email.
+# NOOP_ACTION "skip" leaves everything as it is; "touch" also records the check
+# and bumps the index page's mtime without changing its bytes. --force runs
+# the full pipeline anyway.
+NOOP_ACTION = "skip"
+
+# Relevance prefilter (see relevance.py). Before the prompt is packed, stories
+# are scored locally with BM25 against PRIORITY_KEYWORDS and TRACKED_COMPANIES,
+# weighted by SOURCE_PRIORITY, and only the top RELEVANCE_KEEP_RATIO are kept
+# (never fewer than RELEVANCE_MIN_KEEP). Titles matching a
+# DEPRIORITIZE_PATTERNS regex score half. Set the ratio to 1.0 to turn it off.
+RELEVANCE_KEEP_RATIO = 0.75
+RELEVANCE_MIN_KEEP = 40
+
+TRACKED_COMPANIES = [
+    "openai", "anthropic", "google deepmind", "deepmind", "gemini", "meta ai", "mistral", "xai", "nvidia",
+    "microsoft", "perplexity", "hugging face", "y combinator", "a16z", "sequoia",
+]
+
+DEPRIORITIZE_PATTERNS = [
+    r"^\d+ (best|ways|things|tips|tools|reasons)\b",  # listicles
+    r"\bbest .+ (of|for|in) 20\d\d\b",
+    r"\bhow to\b",
+    r"\b(tutorial|beginner'?s guide|step-by-step|cheat sheet)\b",
+    r"\bphase (1|2|3|i|ii|iii)\b",  # pharma trial news
+    r"\b(oncology|biosimilar|drug pricing|medicaid|hospital system)\b",
+]
+
+# Curation responses are cached on disk, keyed by a hash of the model, prompts
+# and parameters, so re-running the workflow on the same input is free. Pass
+# --no-cache to force a fresh call.
+LLM_CACHE_TTL_HOURS = 36
+LLM_CACHE_MAX_ENTRIES = 50
+
+# Resilient LLM calls (see llm_hedge.py). Each request gets LLM_DEADLINE_SECONDS
+# in total. If it hasn't answered after the LLM_HEDGE_PERCENTILE of recent
+# latencies for its model (at least LLM_HEDGE_MIN_SECONDS; LLM_HEDGE_DEFAULT_SECONDS
+# until there's history), a hedge request is fired and the first answer wins.
+# The hedge goes to LLM_HEDGE_MODEL (None: same model) at LLM_HEDGE_BASE_URL
+# (None: the same endpoint; any OpenAI-compatible API works) with the key in
+# LLM_HEDGE_API_KEY_ENV. Failed requests are retried up to LLM_MAX_RETRIES
+# times per path with jittered exponential back-off from LLM_RETRY_BASE_SECONDS.
+LLM_DEADLINE_SECONDS = 300
+LLM_HEDGE_PERCENTILE = 90
+LLM_HEDGE_MIN_SECONDS = 15
+LLM_HEDGE_DEFAULT_SECONDS = 60
+LLM_HEDGE_MODEL = None
+LLM_HEDGE_BASE_URL = None
+LLM_HEDGE_API_KEY_ENV = "OPENAI_API_KEY"
+LLM_MAX_RETRIES = 2
+LLM_RETRY_BASE_SECONDS = 2
+
+# Curation mode. "single" sends every packed story to GPT-4o in one call.
+# "map-reduce" deals the stories into shards of about CURATION_SHARD_SIZE (at
+# most CURATION_SHARDS of them; past that each shard is packed to the token
+# budget like the single prompt), screens the shards in parallel on
+# CURATION_MAP_MODEL down to a one-line note per notable story, and makes one
+# GPT-4o call over the notes to write the digest. With CURATION_MAP_WORKERS >=
+# CURATION_SHARDS that is two rounds of calls however long the feed list gets.
+# Days small enough for one shard always use a single call. --curation-mode
+# overrides CURATION_MODE.
+CURATION_MODE = "single"
+CURATION_SHARD_SIZE = 60
+CURATION_SHARDS = 8
+CURATION_MAP_WORKERS = 8
+CURATION_MAP_MODEL = "gpt-4o-mini"
+
+# GPT-4o curation prompt: what to pick and how to write it up...
+CURATION_INSTRUCTIONS = """You are a concise, opinionated tech news curator writing a daily briefing for someone in finance who cares deeply about the AI, startup, and personal health tech ecosystems.
 
 PRIORITIES (in order of importance):
 - New funding rounds (who raised, how much, from whom, at what valuation if known)
@@ -105,6 +277,17 @@ Given a list of today's articles (title, source, summary), produce a structured
 
 3. Group any remaining notable stories into 1-3 thematic sections (e.g., "Notable Takes", "Policy & Regulation", "Industry Moves", "Worth Watching"). Write a 2-3 sentence summary per section.
 
+"""
+
+# ...followed by one of two output formats. "full" has the model copy each
+# cited article's title, URL and source; "indexed" has it cite the numbers of
+# the prompt's article list, which generate_digest expands locally. Indexed
+# output is much shorter (completion tokens are the slow, expensive part of
+# the call) and can't contain a URL that wasn't in the prompt.
+CURATION_OUTPUT = "indexed"
+
+FULL_OUTPUT_FORMAT = """Some articles list several sources: they are the same story covered by different outlets. Cite every one of their URLs in that story's "articles" list.
+
 Output valid JSON in this exact format:
 {
   "top_story": {
@@ -140,119 +323,169 @@ If there are fewer than 3 articles, output:
 }
 """
 
+
+INDEXED_OUTPUT_FORMAT = """Every article in the list is numbered. Refer to articles by those numbers only: do not write out titles, URLs or source names, they are filled in from the numbers afterwards. Some articles list several sources: they are the same story covered by different outlets, and citing its number credits all of them.
+
+Output valid JSON in this exact format, where each number is an article number from the list:
+{
+  "top_story": {
+    "title": "Headline",
+    "summary": "3-4 sentence summary",
+    "articles": [4, 11]
+  },
+  "funding_rounds": [
+    {"text": "Company — $50M Series B led by Sequoia (building AI infrastructure for healthcare)", "article": 7}
+  ],
+  "product_launches": [
+    {"text": "OpenAI — GPT-5 released with improved reasoning (available to all API tiers)", "article": 2}
+  ],
+  "stealth_launches": [
+    {"text": "Acme AI — AI-powered legal assistant out of stealth (founded by ex-Google engineers, $10M seed from a16z)", "article": 15}
+  ],
+  "health_tech": [
+    {"text": "Whoop — new blood pressure feature cleared by FDA (expands into medical-grade metrics)", "article": 9}
+  ],
+  "sections": [
+    {
+      "title": "Section title",
+      "summary": "2-3 sentence summary",
+      "articles": [3, 12]
+    }
+  ]
+}
+
+If there are fewer than 3 articles, output:
+{
+  "quiet_day": true,
+  "message": "A brief note that it was a quiet news day."
+}
+"""
+
+SYSTEM_PROMPT = CURATION_INSTRUCTIONS + FULL_OUTPUT_FORMAT
+INDEXED_SYSTEM_PROMPT = CURATION_INSTRUCTIONS + INDEXED_OUTPUT_FORMAT
+
 USER_PROMPT_TEMPLATE = """Here are today's articles from AI and startup news sources. Curate them into a daily digest.
 
 Articles:
 {articles}
 """
 
-# Jinja2 template for individual digest post pages
-POST_TEMPLATE = """<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Daily News – {{ date_formatted }} | Joshua Hou</title>
-    <meta name="description" content="Daily News: AI, startup, and personal health tech briefing for {{ date_formatted }}.">
-    <meta property="og:title" content="Daily News – {{ date_formatted }}">
-    <meta property="og:description" content="{{ top_story_title }}">
-    <meta property="og:type" content="article">
-    <meta property="og:url" content="https://joshhou.com/digest/posts/{{ date_iso }}.html">
-    <link rel="icon" type="image/svg+xml" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>📡</text></svg>">
-    <link rel="preconnect" href="https://fonts.googleapis.com">
-    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
-    <link href="https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-    <link rel="stylesheet" href="../styles.css">
-</head>
-<body>
-    <nav class="nav">
-        <a href="/digest" class="nav-back">&larr; All Digests</a>
-    </nav>
-    <main class="container">
-        <p class="digest-date">{{ date_formatted }}</p>
+# Map step of map-reduce curation: screen one shard of articles
+MAP_SYSTEM_PROMPT = """You screen one batch of today's tech news for a daily briefing on AI, startups, and personal health tech (wearables, consumer diagnostics, longevity, metabolic health).
 
-        {% if quiet_day %}
-        <div class="digest-card">
-            <p>{{ quiet_message }}</p>
-        </div>
-        {% else %}
-        <!-- Top Story -->
-        <div class="digest-card top-story">
-            <span class="digest-card-label">Top Story</span>
-            <h3>{{ top_story.title }}</h3>
-            <p>{{ top_story.summary }}</p>
-            <div class="digest-card-sources">
-                {% for article in top_story.articles %}
+Keep only articles worth a place in the briefing: funding rounds, product launches, companies leaving stealth, personal health tech news, notable takes from industry leaders, major partnerships/acquisitions/hires, and policy that affects startups, AI, or health tech. Skip generic opinion pieces, listicles, tutorials, and rehashed news.
+
+For each article you keep, return its number, a category, an importance score from 1 (minor) to 5 (could be the day's top story), and a one-line note with the key facts (company, amount, investors, product, why it matters).
+
+Categories: "funding_rounds", "product_launches", "stealth_launches", "health_tech", "other".
+
+Output valid JSON in this exact format:
+{"items": [{"id": 3, "category": "funding_rounds", "importance": 4, "note": "Acme AI raised a $40M Series B led by Sequoia to build inference chips"}]}
+"""
+
+MAP_USER_PROMPT_TEMPLATE = """Here is one batch of today's articles. Screen them.
+
+Articles:
+{articles}
+"""
+
+# Reduce step: the usual SYSTEM_PROMPT over the screened notes
+REDUCE_USER_PROMPT_TEMPLATE = """Here are today's notable stories from AI and startup news sources, already screened. Each summary starts with a suggested category and an importance score out of 5. Curate them into a daily digest.
+
+Articles:
+{articles}
+"""
+
+# Jinja2 templates. generate_digest loads these into one shared Environment
+# (with a bytecode cache) under the names in TEMPLATES below, so they can
+# import and include each other.
+
+# Macros shared by the digest body and the index page
+MACROS_TEMPLATE = """{% macro sources(articles) -%}
+<div class="digest-card-sources">
+                {% for article in articles %}
                 <a href="{{ article.url }}" target="_blank" rel="noopener">{{ article.source }}</a>
                 {% endfor %}
             </div>
-        </div>
+{%- endmacro %}
 
-        <!-- Funding Rounds -->
-        {% if funding_rounds %}
+{% macro bullet_card(label, heading, items) -%}
+{% if items %}
         <div class="digest-card">
-            <span class="digest-card-label">💰 Funding</span>
-            <h3>New Funding Rounds</h3>
+            <span class="digest-card-label">{{ label }}</span>
+            <h3>{{ heading }}</h3>
             <ul class="digest-bullet-list">
-                {% for item in funding_rounds %}
+                {% for item in items %}
                 <li><a href="{{ item.url }}" target="_blank" rel="noopener">{{ item.text }}</a></li>
                 {% endfor %}
             </ul>
         </div>
-        {% endif %}
+{% endif %}
+{%- endmacro %}
 
-        <!-- Product Launches -->
-        {% if product_launches %}
-        <div class="digest-card">
-            <span class="digest-card-label">🚀 Launches</span>
-            <h3>New Product Launches</h3>
-            <ul class="digest-bullet-list">
-                {% for item in product_launches %}
-                <li><a href="{{ item.url }}" target="_blank" rel="noopener">{{ item.text }}</a></li>
-                {% endfor %}
-            </ul>
-        </div>
-        {% endif %}
+{% macro archive_item(date_iso, date_formatted, top_story_title) -%}
+<li><a href="/digest/posts/{{ date_iso }}.html"><span class="archive-headline">{{ top_story_title }}</span><span class="archive-date">{{ date_formatted }}</span></a></li>
+{%- endmacro %}
+"""
 
-        <!-- Stealth / New Companies -->
-        {% if stealth_launches %}
-        <div class="digest-card">
-            <span class="digest-card-label">👀 Out of Stealth</span>
-            <h3>Companies Out of Stealth</h3>
-            <ul class="digest-bullet-list">
-                {% for item in stealth_launches %}
-                <li><a href="{{ item.url }}" target="_blank" rel="noopener">{{ item.text }}</a></li>
-                {% endfor %}
-            </ul>
-        </div>
-        {% endif %}
+# The digest itself: date, top story and cards. Rendered once per run and
+# reused by the post page, the index page and the email.
+DIGEST_BODY_TEMPLATE = """{% import "macros.html" as m %}
+        <p class="digest-date">{{ date_formatted }}</p>
 
-        <!-- Personal Health Tech -->
-        {% if health_tech %}
+        {% if quiet_day %}
         <div class="digest-card">
-            <span class="digest-card-label">❤️ Health Tech</span>
-            <h3>Personal Health Tech</h3>
-            <ul class="digest-bullet-list">
-                {% for item in health_tech %}
-                <li><a href="{{ item.url }}" target="_blank" rel="noopener">{{ item.text }}</a></li>
-                {% endfor %}
-            </ul>
+            <p>{{ quiet_message }}</p>
         </div>
-        {% endif %}
+        {% else %}
+        <!-- Top Story -->
+        <div class="digest-card top-story">
+            <span class="digest-card-label">Top Story</span>
+            <h3>{{ top_story.title }}</h3>
+            <p>{{ top_story.summary }}</p>
+            {{ m.sources(top_story.articles) }}
+        </div>
+
+        {{ m.bullet_card("💰 Funding", "New Funding Rounds", funding_rounds) }}
+        {{ m.bullet_card("🚀 Launches", "New Product Launches", product_launches) }}
+        {{ m.bullet_card("👀 Out of Stealth", "Companies Out of Stealth", stealth_launches) }}
+        {{ m.bullet_card("❤️ Health Tech", "Personal Health Tech", health_tech) }}
 
         <!-- Other Sections -->
         {% for section in sections %}
         <div class="digest-card">
             <h3>{{ section.title }}</h3>
             <p>{{ section.summary }}</p>
-            <div class="digest-card-sources">
-                {% for article in section.articles %}
-                <a href="{{ article.url }}" target="_blank" rel="noopener">{{ article.source }}</a>
-                {% endfor %}
-            </div>
+            {{ m.sources(section.articles) }}
         </div>
         {% endfor %}
         {% endif %}
+"""
+
+# Individual digest post pages
+POST_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Daily News – {{ date_formatted }} | Joshua Hou</title>
+    <meta name="description" content="Daily News: AI, startup, and personal health tech briefing for {{ date_formatted }}.">
+    <meta property="og:title" content="Daily News – {{ date_formatted }}">
+    <meta property="og:description" content="{{ top_story_title }}">
+    <meta property="og:type" content="article">
+    <meta property="og:url" content="https://joshhou.com/digest/posts/{{ date_iso }}.html">
+    <link rel="icon" type="image/svg+xml" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>📡</text></svg>">
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link href="https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="../styles.css">
+</head>
+<body>
+    <nav class="nav">
+        <a href="/digest" class="nav-back">&larr; All Digests</a>
+    </nav>
+    <main class="container">
+{{ digest_html }}
     </main>
     <footer class="footer">
         <p>&copy; 2026 Joshua Hou. Generated by an autonomous agent using GPT-4o and RSS feeds.</p>
@@ -261,88 +494,102 @@ POST_TEMPLATE = """<!DOCTYPE html>
 </html>
 """
 
-# Template snippet for the latest digest content (embedded in index.html)
-INDEX_DIGEST_TEMPLATE = """
-        <p class="digest-date">{{ date_formatted }}</p>
-
-        {% if quiet_day %}
-        <div class="digest-card">
-            <p>{{ quiet_message }}</p>
-        </div>
-        {% else %}
-        <!-- Top Story -->
-        <div class="digest-card top-story">
-            <span class="digest-card-label">Top Story</span>
-            <h3>{{ top_story.title }}</h3>
-            <p>{{ top_story.summary }}</p>
-            <div class="digest-card-sources">
-                {% for article in top_story.articles %}
-                <a href="{{ article.url }}" target="_blank" rel="noopener">{{ article.source }}</a>
-                {% endfor %}
-            </div>
-        </div>
+# The digest landing page: latest digest plus the archive list
+INDEX_TEMPLATE = """{% import "macros.html" as m %}<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Daily News – AI, Startups & Health Tech | Joshua Hou</title>
+    <meta name="description" content="A daily curated briefing on what's happening in AI, startups, and personal health tech, powered by an autonomous agent.">
+    <meta property="og:title" content="Daily News – AI, Startups & Health Tech">
+    <meta property="og:description" content="A daily curated briefing on what's happening in AI, startups, and personal health tech.">
+    <meta property="og:type" content="website">
+    <meta property="og:url" content="https://joshhou.com/digest">
+    <link rel="icon" type="image/svg+xml" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>📡</text></svg>">
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link href="https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="styles.css">
+</head>
+<body>
+    <nav class="nav">
+        <a href="/" class="nav-back">&larr; joshhou.com</a>
+    </nav>
+    <main class="container">
+        <header class="hero">
+            <h1 class="hero-title">Daily News</h1>
+            <p class="hero-subtitle">A curated briefing on AI, startups, and personal health tech, generated every morning by an autonomous agent.</p>
+        </header>
 
-        {% if funding_rounds %}
-        <div class="digest-card">
-            <span class="digest-card-label">💰 Funding</span>
-            <h3>New Funding Rounds</h3>
-            <ul class="digest-bullet-list">
-                {% for item in funding_rounds %}
-                <li><a href="{{ item.url }}" target="_blank" rel="noopener">{{ item.text }}</a></li>
-                {% endfor %}
-            </ul>
-        </div>
-        {% endif %}
+        <section id="latest-digest" class="latest-digest">
+{{ latest_html }}
+        </section>
 
-        {% if product_launches %}
-        <div class="digest-card">
-            <span class="digest-card-label">🚀 Launches</span>
-            <h3>New Product Launches</h3>
-            <ul class="digest-bullet-list">
-                {% for item in product_launches %}
-                <li><a href="{{ item.url }}" target="_blank" rel="noopener">{{ item.text }}</a></li>
+        <section class="archive-section">
+            <h2 class="archive-heading">Archive</h2>
+            <ul id="archive-list" class="archive-list">
+                {% for item in archive %}
+                {{ m.archive_item(item.date_iso, item.date_formatted, item.top_story_title) }}
+                {% else %}
+                <li class="archive-empty">No digests yet. The first one is on its way.</li>
                 {% endfor %}
             </ul>
-        </div>
-        {% endif %}
-
-        {% if stealth_launches %}
-        <div class="digest-card">
-            <span class="digest-card-label">👀 Out of Stealth</span>
-            <h3>Companies Out of Stealth</h3>
-            <ul class="digest-bullet-list">
-                {% for item in stealth_launches %}
-                <li><a href="{{ item.url }}" target="_blank" rel="noopener">{{ item.text }}</a></li>
+            {% if months %}
+            <h3 class="archive-subheading">Browse by month</h3>
+            <ul class="archive-list archive-months">
+                {% for month in months %}
+                <li><a href="/digest/archive/{{ month.key }}.html"><span class="archive-headline">{{ month.label }}</span><span class="archive-date">{{ month.count }} digest{{ "s" if month.count != 1 }}</span></a></li>
                 {% endfor %}
             </ul>
-        </div>
-        {% endif %}
+            {% endif %}
+        </section>
+    </main>
+    <footer class="footer">
+        <p>&copy; 2026 Joshua Hou. Built with an autonomous agent, GPT-4o, and RSS feeds.</p>
+    </footer>
+    <script src="main.js"></script>
+</body>
+</html>"""
 
-        {% if health_tech %}
-        <div class="digest-card">
-            <span class="digest-card-label">❤️ Health Tech</span>
-            <h3>Personal Health Tech</h3>
-            <ul class="digest-bullet-list">
-                {% for item in health_tech %}
-                <li><a href="{{ item.url }}" target="_blank" rel="noopener">{{ item.text }}</a></li>
+# One month of the archive (digest/archive/YYYY-MM.html)
+ARCHIVE_MONTH_TEMPLATE = """{% import "macros.html" as m %}<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Daily News – {{ month_label }} Archive | Joshua Hou</title>
+    <meta name="description" content="Every Daily News briefing on AI, startups, and personal health tech from {{ month_label }}.">
+    <link rel="icon" type="image/svg+xml" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>📡</text></svg>">
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link href="https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="../styles.css">
+</head>
+<body>
+    <nav class="nav">
+        <a href="/digest" class="nav-back">&larr; All Digests</a>
+    </nav>
+    <main class="container">
+        <section class="archive-section">
+            <h2 class="archive-heading">{{ month_label }}</h2>
+            <ul class="archive-list">
+                {% for item in archive %}
+                {{ m.archive_item(item.date_iso, item.date_formatted, item.top_story_title) }}
                 {% endfor %}
             </ul>
-        </div>
-        {% endif %}
-
-        {% for section in sections %}
-        <div class="digest-card">
-            <h3>{{ section.title }}</h3>
-            <p>{{ section.summary }}</p>
-            <div class="digest-card-sources">
-                {% for article in section.articles %}
-                <a href="{{ article.url }}" target="_blank" rel="noopener">{{ article.source }}</a>
-                {% endfor %}
-            </div>
-        </div>
-        {% endfor %}
-        {% endif %}
-"""
+        </section>
+    </main>
+    <footer class="footer">
+        <p>&copy; 2026 Joshua Hou. Built with an autonomous agent, GPT-4o, and RSS feeds.</p>
+    </footer>
+</body>
+</html>"""
 
-# Template for archive list items
-ARCHIVE_ITEM_TEMPLATE = """<li><a href="/digest/posts/{{ date_iso }}.html"><span class="archive-headline">{{ top_story_title }}</span><span class="archive-date">{{ date_formatted }}</span></a></li>"""
+TEMPLATES = {
+    "macros.html": MACROS_TEMPLATE,
+    "digest_body.html": DIGEST_BODY_TEMPLATE,
+    "post.html": POST_TEMPLATE,
+    "index.html": INDEX_TEMPLATE,
+    "archive_month.html": ARCHIVE_MONTH_TEMPLATE,
+}
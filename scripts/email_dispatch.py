@@ -0,0 +1,421 @@
+"""
+Parallel, rate-limited, batched email dispatch through Resend.
+
+A Dispatcher groups messages into batches of up to BATCH_LIMIT and posts them
+from a pool of worker threads over one keep-alive session, under a token
+bucket that backs off on 429s. Messages that still fail for a transient reason
+go to a RetryQueue (refs only, no addresses) to be rebuilt and resent later;
+an unanswered batch is resent whole under its original Idempotency-Key.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import atomic_file
+
+logger = logging.getLogger(__name__)
+
+RESEND_EMAILS_URL = "https://api.resend.com/emails"
+RESEND_BATCH_URL = "https://api.resend.com/emails/batch"
+BATCH_LIMIT = 100  # Resend's maximum messages per batch request
+REQUEST_TIMEOUT = 30
+TRANSIENT_RETRIES = 3  # in-place retries after a 429 / 5xx / network error
+RETRY_BASE_SECONDS = 1.0  # back-off when the response gives no Retry-After
+MAX_RETRY_AFTER_SECONDS = 60
+RATE_FLOOR_FRACTION = 0.125  # a throttled bucket never drops below this share of its ceiling
+RATE_RECOVERY_STEPS = 20  # successes to climb from the floor back to the ceiling
+AUTH_STATUSES = (401, 403)  # the API key is missing, revoked or lacks permission
+PAYLOAD_STATUSES = (400, 422)  # the request was malformed; single sends may pass
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class AuthError(Exception):
+    """Resend refused the API key: no further request will get through."""
+
+
+def session(pool_size=16):
+    """The shared keep-alive Session for email API calls."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size))
+        return _session
+
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second on average, bursts of up to `burst`.
+
+    The rate adapts: throttled() halves it and can pause acquisitions for a
+    while; recovered() climbs it back towards the rate it was created with.
+    """
+
+    def __init__(self, rate, burst):
+        self.ceiling = float(rate)
+        self.floor = self.ceiling * RATE_FLOOR_FRACTION
+        self.rate = self.ceiling
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    start = max(self.updated, self.paused_until)
+                    self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self, retry_after=None):
+        with self.lock:
+            self.rate = max(self.floor, self.rate / 2)
+            self.tokens = 0.0
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            rate = self.rate
+        pause = f", pausing {retry_after:.1f}s" if retry_after else ""
+        logger.warning(f"Throttled by Resend: send rate now {rate:.2f}/s{pause}")
+
+    def recovered(self):
+        with self.lock:
+            self.rate = min(self.ceiling, self.rate + (self.ceiling - self.floor) / RATE_RECOVERY_STEPS)
+
+
+# --- Resend calls ---
+
+def _headers(api_key, **extra):
+    return {"Authorization": f"Bearer {api_key}", **extra}
+
+
+def _recipient(message):
+    to = message.get("to")
+    return to[0] if isinstance(to, list) and len(to) == 1 else to
+
+
+def _hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def idempotency_key(payload, scope):
+    """Idempotency-Key for a message (or batch) sent within scope: a hash of
+    the scope and each message's recipient and subject, so the same email
+    rebuilt later in the scope gets the same key."""
+    messages = payload if isinstance(payload, list) else [payload]
+    return _hash([scope] + [[m.get("to"), m.get("subject")] for m in messages])
+
+
+def _retry_after(resp):
+    """Seconds from a Retry-After header (delta or HTTP date), or None."""
+    value = resp.headers.get("Retry-After") or resp.headers.get("ratelimit-reset")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(MAX_RETRY_AFTER_SECONDS, max(0.0, seconds))
+
+
+def _post(url, api_key, payload, limiter, timeout, idempotency_scope, key=None, **headers):
+    """POST payload, retrying transient failures in place.
+
+    Returns (response, None, False) on success, otherwise (last response or
+    None, error text, retryable) where retryable means the failure was a 429, 5xx or network
+    error and the same request may well succeed later. Raises AuthError on a
+    401 / 403. key, if given, is the Idempotency-Key to send instead of one
+    built from idempotency_scope.
+    """
+    key = key or (idempotency_scope and idempotency_key(payload, idempotency_scope))
+    if key:
+        headers["Idempotency-Key"] = key
+    resp, error = None, None
+    for attempt in range(TRANSIENT_RETRIES + 1):
+        if attempt:
+            logger.info(f"Retrying Resend request ({error})")
+        if limiter:
+            limiter.acquire()
+        wait = RETRY_BASE_SECONDS * 2 ** attempt
+        try:
+            resp = session().post(url, headers=_headers(api_key, **headers), json=payload, timeout=timeout)
+        except Exception as e:
+            resp, error = None, str(e)
+        else:
+            if resp.status_code in (200, 201):
+                if limiter:
+                    limiter.recovered()
+                return resp, None, False
+            error = f"Resend {resp.status_code}: {resp.text[:200]}"
+            if resp.status_code in AUTH_STATUSES:
+                raise AuthError(error)
+            if resp.status_code != 429 and resp.status_code < 500:
+                return resp, error, False
+            retry_after = _retry_after(resp)
+            if resp.status_code == 429 and limiter:
+                limiter.throttled(retry_after if retry_after is not None else wait)
+                wait = 0.0  # the limiter holds every worker back now
+            elif retry_after is not None:
+                wait = retry_after
+        if attempt < TRANSIENT_RETRIES and wait:
+            time.sleep(wait)
+    return resp, error, True
+
+
+def send_one(api_key, message, limiter=None, timeout=REQUEST_TIMEOUT, idempotency_scope=None, key=None):
+    """POST one message. Returns (ok, Resend id or error text, retryable);
+    raises AuthError if the API key is refused."""
+    resp, error, retryable = _post(RESEND_EMAILS_URL, api_key, message, limiter, timeout, idempotency_scope, key)
+    if error:
+        return False, error, retryable
+    try:
+        return True, resp.json().get("id"), False
+    except ValueError:
+        return True, None, False
+
+
+def _batch_results(body, n):
+    """Per-message (ok, detail, retryable) from a permissive batch response:
+    errors carry the index of the message they reject, data lists the ids of
+    the rest in order."""
+    rejected = {e.get("index"): e.get("message", "rejected") for e in body.get("errors") or []}
+    ids = iter(d.get("id") for d in body.get("data") or [])
+    return [
+        (False, f"rejected: {rejected[i]}", False) if i in rejected else (True, next(ids, None), False)
+        for i in range(n)
+    ]
+
+
+def send_batch(api_key, messages, limiter=None, timeout=REQUEST_TIMEOUT, idempotency_scope=None, key=None):
+    """Send up to BATCH_LIMIT messages in one request, retrying rejected ones
+    singly. Returns ([(ok, detail, retryable)], unsent): unsent means the batch
+    got no answer and must be resent whole under the same key."""
+    if len(messages) == 1:
+        ok, detail, retryable = send_one(api_key, messages[0], limiter, timeout, idempotency_scope, key)
+        return [(ok, detail, retryable)], retryable
+    started = time.monotonic()
+    resp, error, retryable = _post(
+        RESEND_BATCH_URL, api_key, messages, limiter, timeout, idempotency_scope, key,
+        **{"x-batch-validation": "permissive"},
+    )
+    elapsed = time.monotonic() - started
+    if not error:
+        results = _batch_results(resp.json(), len(messages))
+    else:
+        logger.warning(f"Resend batch of {len(messages)} failed: {error}")
+        if retryable or resp is None or resp.status_code not in PAYLOAD_STATUSES:
+            return [(False, error, retryable)] * len(messages), retryable
+        results = [(False, error, False)] * len(messages)
+    accepted = sum(1 for ok, _, _ in results if ok)
+    logger.info(f"Resend batch: {accepted}/{len(messages)} accepted in {elapsed:.2f}s")
+
+    for i, (ok, detail, _) in enumerate(results):
+        if not ok:
+            logger.info(f"Retrying {_recipient(messages[i])} on its own ({detail})")
+            results[i] = send_one(api_key, messages[i], limiter, timeout, idempotency_scope)
+    return results, False
+
+
+# --- Retry queue ---
+
+class RetryQueue:
+    """Refs of sends that failed for a transient reason, kept in a JSON file
+    until they succeed, fail max_attempts times or pass max_age_hours."""
+
+    def __init__(self, path, max_attempts, max_age_hours):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.max_age = max_age_hours * 3600
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> {"ref", "batch", "attempts", "first_failed_at", "last_error"}
+        self.taken = {}
+        try:
+            loaded = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            loaded = []
+        for entry in loaded:
+            if time.time() - entry.get("first_failed_at", 0) > self.max_age:
+                logger.warning(f"Dropping queued email {entry['ref']}: too old to send")
+                continue
+            self.entries[_hash(entry["ref"])] = entry
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries) + len(self.taken)
+
+    def push(self, ref, error, batch=None):
+        """Record a transient failure; False if the message was given up on.
+        batch is the Idempotency-Key of the unanswered batch the message was
+        in, if it must be resent as part of that batch."""
+        key = _hash(ref)
+        with self.lock:
+            entry = self.entries.get(key) or self.taken.pop(key, None) or {
+                "ref": ref, "attempts": 0, "first_failed_at": time.time(),
+            }
+            entry["attempts"] += 1
+            entry["last_error"] = error
+            entry["batch"] = batch
+            if entry["attempts"] >= self.max_attempts:
+                self.entries.pop(key, None)
+                logger.warning(f"Giving up on email {ref} after {entry['attempts']} attempts")
+                return False
+            self.entries[key] = entry
+            return True
+
+    def done(self, ref):
+        key = _hash(ref)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.taken.pop(key, None)
+
+    def take(self):
+        """Every queued (ref, batch key or None), for its message to be rebuilt
+        and sent again."""
+        with self.lock:
+            refs = [(e["ref"], e.get("batch")) for e in self.entries.values()]
+            self.taken.update(self.entries)
+            self.entries = {}
+            return refs
+
+    def save(self):
+        with self.lock:
+            pending = list(self.entries.values()) + list(self.taken.values())
+        try:
+            if not pending:
+                self.path.unlink(missing_ok=True)
+                return
+            atomic_file.write(self.path, json.dumps(pending))
+        except OSError as e:
+            logger.warning(f"Could not write email retry queue: {e}")
+
+
+# --- Dispatch ---
+
+class Dispatcher:
+    """Batch messages and send the batches on `workers` threads, queueing
+    transient failures in retry_queue; with no api_key, only log them."""
+
+    def __init__(self, api_key, workers, rate, burst, batch_size=BATCH_LIMIT, retry_queue=None,
+                 idempotency_scope=None):
+        self.api_key = api_key
+        self.idempotency_scope = idempotency_scope
+        self.batch_size = max(1, min(batch_size, BATCH_LIMIT))
+        self.retry_queue = retry_queue
+        self.limiter = TokenBucket(rate, burst)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email")
+        self.slots = threading.BoundedSemaphore(workers * 2)  # queued + running batches
+        self.lock = threading.Lock()
+        self.batch = []
+        self.refused = None
+        self.succeeded = 0
+        self.failed = 0
+
+    def add(self, message, ref=None):
+        self.batch.append((message, ref))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        if not self.api_key:
+            for m, _ in batch:
+                logger.info(f"RESEND_API_KEY not set — would send to {_recipient(m)}: {m.get('subject')!r}")
+                self._record(False)
+            return
+        self.slots.acquire()
+        self.pool.submit(self._run, batch)
+
+    def resend(self, batch, key):
+        """Send (message, ref) pairs from an unanswered batch as one request
+        under that batch's Idempotency-Key."""
+        self.flush()
+        if not self.api_key:
+            self.batch = batch
+            return self.flush()
+        self.slots.acquire()
+        self.pool.submit(self._run, batch, key)
+
+    def _refuse(self, batch, error):
+        with self.lock:
+            first = self.refused is None
+            self.refused = self.refused or error
+        if first:
+            logger.error(f"Resend refused the API key, not sending any more email: {error}")
+        for message, _ in batch:
+            logger.warning(f"Not sent to {_recipient(message)}: API key refused")
+            self._record(False)
+
+    def _run(self, batch, key=None):
+        messages = [m for m, _ in batch]
+        if key is None and self.idempotency_scope and len(batch) > 1:
+            key = idempotency_key(messages, self.idempotency_scope)
+        unsent = False
+        try:
+            if self.refused:
+                return self._refuse(batch, self.refused)
+            results, unsent = send_batch(self.api_key, messages, self.limiter,
+                                         idempotency_scope=self.idempotency_scope, key=key)
+        except AuthError as e:
+            return self._refuse(batch, str(e))
+        except Exception as e:  # send_batch reports its own failures; this is a backstop
+            results, unsent = [(False, str(e), True)] * len(batch), True
+        finally:
+            self.slots.release()
+        queue = self.retry_queue
+        for (message, ref), (ok, detail, retryable) in zip(batch, results):
+            if ok:
+                logger.info(f"Email sent to {_recipient(message)}")
+                if queue is not None and ref is not None:
+                    queue.done(ref)
+            elif retryable and queue is not None and ref is not None and queue.push(
+                    ref, detail, key if unsent and len(batch) > 1 else None):
+                logger.warning(f"Send failed for {_recipient(message)}: {detail} (queued for retry)")
+            else:
+                logger.warning(f"Send failed for {_recipient(message)}: {detail}")
+                if queue is not None and ref is not None:
+                    queue.done(ref)  # permanent failure: retrying won't help
+            self._record(ok)
+
+    def _record(self, ok):
+        with self.lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def close(self):
+        self.flush()
+        self.pool.shutdown(wait=True)
+        if self.retry_queue is not None:
+            self.retry_queue.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
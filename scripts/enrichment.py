@@ -0,0 +1,252 @@
+"""
+Full-text enrichment for digest stories.
+
+RSS summaries often stop before the facts that matter most for a funding
+round: the amount, the lead investor, the valuation. This fetches each
+story's article page, pulls out the main text, and attaches the opening of
+it as story["excerpt"] for the prompt.
+
+Fetching is bounded three ways: at most `workers` pages at once, at most
+`per_host` of them against any one site, and a wall-clock `budget` after
+which outstanding pages are abandoned and their stories go to the prompt
+without an excerpt. The budget is hard: fetches run on daemon threads (an
+abandoned one can't hold the process open at exit) and stop reading a
+trickling page once the budget's deadline passes. Extracted text is cached on disk per URL (HTTP errors and
+non-HTML responses too, for a shorter time) so re-runs and overlapping days
+don't refetch.
+
+Extraction is a plain stdlib HTML parse: paragraph text inside <article> (or
+<main>) if the page has one, otherwise every paragraph outside navigation,
+headers, footers and asides.
+"""
+
+import codecs
+import hashlib
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+
+import atomic_file
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+MIN_PARAGRAPH_CHARS = 40  # shorter <p>s are bylines, captions, share buttons
+SUCCESS_TTL_SECONDS = 14 * 86400
+FAILURE_TTL_SECONDS = 86400
+
+HEADER_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.I)
+META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.I)
+
+SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figcaption"}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.in_p = False
+        self.current = []
+        self.paragraphs = []  # (inside_main, text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in ("article", "main"):
+            self.main_depth += 1
+        elif tag == "p":
+            self._close_p()
+            self.in_p = True
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in ("article", "main"):
+            self._close_p()
+            self.main_depth = max(0, self.main_depth - 1)
+        elif tag == "p":
+            self._close_p()
+
+    def handle_data(self, data):
+        if self.in_p and not self.skip_depth:
+            self.current.append(data)
+
+    def _close_p(self):
+        if self.in_p:
+            text = " ".join("".join(self.current).split())
+            if len(text) >= MIN_PARAGRAPH_CHARS:
+                self.paragraphs.append((self.main_depth > 0, text))
+        self.in_p = False
+        self.current = []
+
+
+def extract_text(html):
+    """Main body text of an HTML page, paragraphs separated by blank lines."""
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:  # malformed markup: keep whatever parsed
+        pass
+    parser._close_p()
+    main = [t for inside, t in parser.paragraphs if inside]
+    return "\n\n".join(main or [t for _, t in parser.paragraphs])
+
+
+# --- Page cache ---
+
+def _cache_path(cache_dir, url):
+    return Path(cache_dir) / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+
+def _cache_get(cache_dir, url):
+    try:
+        entry = json.loads(_cache_path(cache_dir, url).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    ttl = SUCCESS_TTL_SECONDS if entry.get("text") else FAILURE_TTL_SECONDS
+    return entry if time.time() - entry.get("fetched_at", 0) <= ttl else None
+
+
+def _cache_put(cache_dir, url, text, error=None):
+    p = _cache_path(cache_dir, url)
+    try:
+        atomic_file.write(p, json.dumps({"url": url, "fetched_at": time.time(), "text": text, "error": error}))
+    except OSError as e:
+        logger.warning(f"Could not write page cache entry: {e}")
+
+
+def prune_cache(cache_dir):
+    """Delete page cache entries past the success TTL."""
+    now = time.time()
+    for p in Path(cache_dir).glob("*.json") if Path(cache_dir).exists() else []:
+        if now - p.stat().st_mtime > SUCCESS_TTL_SECONDS:
+            p.unlink(missing_ok=True)
+
+
+# --- Fetching ---
+
+class NotHTMLError(ValueError):
+    pass
+
+
+def page_encoding(content_type, body):
+    """Charset from the Content-Type header if the server sent one, else from
+    a <meta charset> near the top of the page, else UTF-8. (requests reports
+    ISO-8859-1 for any text/html without a header charset, which garbles
+    pages that only declare theirs in markup.)"""
+    m = HEADER_CHARSET_RE.search(content_type or "") or META_CHARSET_RE.search(body[:4096])
+    if m:
+        name = m.group(1).decode("ascii") if isinstance(m.group(1), bytes) else m.group(1)
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+def fetch_text(url, timeout, user_agent, deadline=None):
+    """Main text of the page at url. timeout applies per read; deadline (a
+    time.monotonic() value) bounds the whole download."""
+    resp = requests.get(url, headers={"User-Agent": user_agent}, timeout=timeout, stream=True)
+    try:
+        resp.raise_for_status()
+        if "html" not in resp.headers.get("Content-Type", "html"):
+            raise NotHTMLError(f"not an HTML page ({resp.headers.get('Content-Type')})")
+        body = b""
+        for chunk in resp.iter_content(16 * 1024):
+            body += chunk
+            if len(body) >= MAX_PAGE_BYTES:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("page still downloading at the enrichment deadline")
+    finally:
+        resp.close()
+    return extract_text(body.decode(page_encoding(resp.headers.get("Content-Type"), body), errors="replace"))
+
+
+def enrich(stories, cache_dir, workers, per_host, timeout, budget, user_agent, make_excerpt):
+    """Attach story["excerpt"] = make_excerpt(page text) to as many stories as
+    fit in budget seconds. Returns counts of cached, fetched, failed and
+    unfinished pages."""
+    started = time.monotonic()
+    deadline = started + budget
+    host_slots = defaultdict(lambda: threading.Semaphore(per_host))
+    slots_lock = threading.Lock()
+    stats = {"cached": 0, "fetched": 0, "failed": 0, "unfinished": 0}
+
+    def host_slot(url):
+        with slots_lock:
+            return host_slots[urlparse(url).netloc.lower()]
+
+    def work(url):
+        slot = host_slot(url)
+        if not slot.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise TimeoutError("waited too long for a slot on this host")
+        try:
+            try:
+                text = fetch_text(url, timeout, user_agent, deadline)
+            except (requests.HTTPError, NotHTMLError) as e:
+                # Only the page's own answer is worth remembering; running out
+                # of this run's budget says nothing about tomorrow's fetch.
+                _cache_put(cache_dir, url, "", error=str(e)[:200])
+                raise
+            _cache_put(cache_dir, url, text)
+            return text
+        finally:
+            slot.release()
+
+    pending = {}
+    for story in stories:
+        entry = _cache_get(cache_dir, story["url"])
+        if entry is not None:
+            stats["cached"] += 1
+            if entry["text"]:
+                story["excerpt"] = make_excerpt(entry["text"])
+        else:
+            pending.setdefault(story["url"], []).append(story)
+
+    if pending:
+        todo = queue.Queue()
+        for url in pending:
+            todo.put(url)
+        done = queue.Queue()  # (url, ok, text or error)
+
+        def worker():
+            while time.monotonic() < deadline:
+                try:
+                    url = todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    done.put((url, True, work(url)))
+                except Exception as e:
+                    done.put((url, False, e))
+
+        for i in range(min(workers, len(pending))):
+            threading.Thread(target=worker, name=f"enrich-{i}", daemon=True).start()
+        for _ in range(len(pending)):
+            try:
+                url, ok, value = done.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break  # out of budget: the rest finish (or not) unobserved
+            if not ok:
+                stats["failed"] += 1
+                logger.debug(f"No full text for {url}: {value}")
+                continue
+            stats["fetched"] += 1
+            if value:
+                for story in pending[url]:
+                    story["excerpt"] = make_excerpt(value)
+        stats["unfinished"] = len(pending) - stats["fetched"] - stats["failed"]
+    return stats
@@ -0,0 +1,68 @@
+"""
+On-disk cache for the digest's RSS feeds.
+
+Each feed gets one small JSON file (named by a hash of its URL) holding the
+validators from its last full response — ETag and Last-Modified — a hash of
+the body, and the entries feedparser produced from it, already reduced to
+plain dicts. The fetcher sends the validators back as a conditional GET; on a
+304, or a 200 whose body hashes the same as last time, the cached entries are
+reused and feedparser never runs.
+
+Entries are stored whole (not filtered by date or capped), because what
+counts as "recent" depends on when the next run happens.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import atomic_file
+
+logger = logging.getLogger(__name__)
+
+
+def _path(cache_dir, url):
+    return Path(cache_dir) / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+
+def body_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def load(cache_dir, url):
+    """The cached record for url, or None if there isn't a usable one."""
+    p = _path(cache_dir, url)
+    if not p.exists():
+        return None
+    try:
+        record = json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable feed cache {p.name}: {e}")
+        return None
+    return record if record.get("url") == url else None
+
+
+def save(cache_dir, url, etag, last_modified, content_hash, entries):
+    p = _path(cache_dir, url)
+    record = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "body_hash": content_hash,
+        "entries": entries,
+    }
+    try:
+        atomic_file.write(p, json.dumps(record, ensure_ascii=False))  # a killed run never leaves half a file
+    except OSError as e:
+        logger.warning(f"Could not write feed cache for {url}: {e}")
+
+
+def conditional_headers(record):
+    """If-None-Match / If-Modified-Since for a cached record (empty if none)."""
+    headers = {}
+    if record and record.get("etag"):
+        headers["If-None-Match"] = record["etag"]
+    if record and record.get("last_modified"):
+        headers["If-Modified-Since"] = record["last_modified"]
+    return headers
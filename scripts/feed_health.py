@@ -0,0 +1,133 @@
+"""
+Per-feed health records and circuit breaker for the digest fetcher.
+
+Every run updates one record per feed URL: recent latencies, recent yields
+(fresh entries contributed), the current failure and empty-feed streaks, and
+when it last succeeded or failed. A feed that keeps failing, or keeps
+answering with no entries at all, trips its breaker and is skipped until
+open_until. The back-off doubles each time it trips again (capped). Once
+open_until passes, the next run probes the feed; any healthy answer closes
+the breaker.
+
+A feed with entries but nothing inside the freshness window is healthy: a
+blog that posts weekly is quiet most days, and since conditional requests
+those quiet days are mostly cheap 304s. Empty-feed back-off is capped below
+the fetch window (policy["empty_backoff_max_hours"]), so a skipped run never
+lets a post age out unseen.
+
+The records are also the data for `generate_digest.py --feed-report`, which
+is how dead feeds get spotted and pruned from RSS_FEEDS.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import atomic_file
+
+logger = logging.getLogger(__name__)
+
+HISTORY = 20  # latencies / yields kept per feed
+
+
+def load(path):
+    p = Path(path)
+    if not p.exists():
+        return {}
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable feed health file: {e}")
+        return {}
+
+
+def save(path, state):
+    p = Path(path)
+    try:
+        atomic_file.write(p, json.dumps(state, indent=1, ensure_ascii=False))
+    except OSError as e:
+        logger.warning(f"Could not write feed health file: {e}")
+
+
+def record_for(state, url, name):
+    rec = state.setdefault(url, {
+        "name": name, "latencies": [], "yields": [], "failure_streak": 0, "empty_streak": 0,
+        "trips": 0, "open_until": None, "last_success": None, "last_failure": None, "last_error": None,
+    })
+    rec["name"] = name
+    return rec
+
+
+def is_open(rec, now):
+    """True if the breaker is open and this run should skip the feed."""
+    return bool(rec.get("open_until")) and now < datetime.fromisoformat(rec["open_until"])
+
+
+def _trip(rec, now, reason, backoff_base_hours, backoff_max_hours):
+    hours = min(backoff_base_hours * 2 ** rec["trips"], backoff_max_hours)
+    rec["trips"] += 1
+    rec["empty_streak"] = 0  # the probe after the back-off starts a fresh count
+    rec["open_until"] = (now + timedelta(hours=hours)).isoformat()
+    logger.warning(f"Circuit open for {rec['name']} ({reason}); skipping it for {hours:g}h")
+
+
+def record_success(rec, now, seconds, fresh, empty, policy):
+    """A feed answered: fresh entries in the window, empty if it had no
+    entries at all (a 304 or unchanged body is never empty)."""
+    rec["latencies"] = (rec["latencies"] + [round(seconds, 3)])[-HISTORY:]
+    rec["yields"] = (rec["yields"] + [fresh])[-HISTORY:]
+    rec["last_success"] = now.isoformat()
+    rec["failure_streak"] = 0
+    if not empty:
+        rec["empty_streak"], rec["trips"], rec["open_until"] = 0, 0, None
+        return
+    rec["empty_streak"] += 1
+    if rec["empty_streak"] >= policy["empty_threshold"]:
+        _trip(rec, now, f"empty feed {rec['empty_streak']} runs in a row", policy["backoff_base_hours"],
+              min(policy["backoff_max_hours"], policy["empty_backoff_max_hours"]))
+
+
+def record_failure(rec, now, error, policy):
+    rec["failure_streak"] += 1
+    rec["last_failure"] = now.isoformat()
+    rec["last_error"] = str(error)[:200]
+    if rec["failure_streak"] >= policy["failure_threshold"]:
+        _trip(rec, now, f"{rec['failure_streak']} failures in a row", policy["backoff_base_hours"], policy["backoff_max_hours"])
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report(state, now):
+    """A plain-text table of every feed's health, worst first."""
+    rows = []
+    for url, rec in state.items():
+        avg_yield = sum(rec["yields"]) / len(rec["yields"]) if rec["yields"] else 0.0
+        status = "open" if is_open(rec, now) else ("probing" if rec.get("open_until") else "ok")
+        rows.append({
+            "name": rec["name"],
+            "status": status,
+            "p50": _percentile(rec["latencies"], 50),
+            "p95": _percentile(rec["latencies"], 95),
+            "fails": rec["failure_streak"],
+            "empty": rec.get("empty_streak", 0),
+            "avg_yield": avg_yield,
+            "last_success": (rec["last_success"] or "never")[:16],
+        })
+    rows.sort(key=lambda r: (r["status"] == "ok", -r["fails"], r["avg_yield"], r["name"]))
+
+    def secs(v):
+        return "-" if v is None else f"{v:.2f}s"
+
+    lines = [f"{'feed':32} {'state':8} {'p50':>7} {'p95':>7} {'fails':>5} {'empty':>5} {'avg new':>7}  last success"]
+    for r in rows:
+        lines.append(
+            f"{r['name'][:32]:32} {r['status']:8} {secs(r['p50']):>7} {secs(r['p95']):>7} {r['fails']:>5} {r['empty']:>5} "
+            f"{r['avg_yield']:>7.1f}  {r['last_success']}"
+        )
+    return "\n".join(lines)
@@ -19,6 +19,7 @@ Modes:
     --mode send-test --day N   Send day N's email to one test address (--to, or TEST_EMAIL env)
     --mode remind-evening      Nudge subscribers who haven't completed their current day
     --mode remind-morning      Same, morning copy
+    --mode retry-failed        Resend emails an earlier run queued after a 429 / 5xx (.cache/bible)
 
 Environment:
     ANTHROPIC_API_KEY    Claude analysis (with web search)
@@ -36,14 +37,15 @@ import logging
 import os
 import re
 import sys
+import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-import requests
 from jinja2 import Template
 
 sys.path.insert(0, str(Path(__file__).parent))
 import bible_links as bl
+import email_dispatch
 from bible_config import (
     BIBLE_POST_TEMPLATE,
     BIBLE_SYSTEM_PROMPT,
@@ -59,11 +61,31 @@ REPO_ROOT = Path(__file__).parent.parent
 BIBLE_DIR = REPO_ROOT / "bible"
 POSTS_DIR = BIBLE_DIR / "posts"
 PLAN_PATH = Path(__file__).parent / "reading_plan.json"
+RETRY_QUEUE_PATH = REPO_ROOT / ".cache" / "bible" / "email_retry.json"
 
 TOTAL_DAYS = 365
 ET_OFFSET = timezone(timedelta(hours=-4))  # EDT
 MODEL = "claude-sonnet-4-6"
 EMAIL_FROM = "Daily Bible Reading <bible@joshhou.com>"
+# Send path: emails go out in Resend batch requests of EMAIL_BATCH_SIZE (the
+# API allows 100), EMAIL_WORKERS batches at a time, held to Resend's API rate
+# limit (2 requests/second by default) by a token bucket.
+EMAIL_BATCH_SIZE = 100
+EMAIL_WORKERS = 4
+EMAIL_RATE_PER_SECOND = 2
+EMAIL_BURST = 2
+# Emails that fail for a transient reason (429, 5xx, network) are queued in
+# RETRY_QUEUE_PATH: retried up to EMAIL_RETRY_PASSES times at the end of the
+# same run, EMAIL_RETRY_DELAY_SECONDS apart, then left for --mode retry-failed.
+# A message is dropped after EMAIL_RETRY_MAX_ATTEMPTS failures or once it is
+# EMAIL_RETRY_MAX_AGE_HOURS old (before the next morning's send). The queue
+# travels between runs in the Actions cache, so it records only subscriber
+# id, day, kind and send date; addresses and signed mark-read links are
+# rebuilt from Supabase when it is drained.
+EMAIL_RETRY_PASSES = 2
+EMAIL_RETRY_DELAY_SECONDS = 30
+EMAIL_RETRY_MAX_ATTEMPTS = 5
+EMAIL_RETRY_MAX_AGE_HOURS = 20
 SITE = "https://joshhou.com"
 
 
@@ -205,25 +227,103 @@ def render_email(entry, analysis, plan, sub_id, reminder=False):
     return Template(tmpl).render(**ctx)
 
 
+def email_message(to_email, subject, html):
+    return {"from": EMAIL_FROM, "to": [to_email], "subject": subject, "html": html}
+
+
+def build_email(plan, sub, day, kind):
+    """The email telling `sub` about `day`: kind "send" is the daily reading,
+    "evening" / "morning" the reminders. None if the day isn't generated yet."""
+    entry, analysis = get_entry_by_day(plan, day), load_analysis(day)
+    if not entry or not analysis:
+        return None
+    if kind == "send":
+        subject = f"Day {day}: {entry['passage']}" + (f" — {analysis['title']}" if analysis.get("title") else "")
+    else:
+        word = "waiting for you" if kind == "evening" else "before today's reading"
+        subject = f"Day {day}: {entry['passage']} is {word}"
+    html = render_email(entry, analysis, plan, sub["id"], reminder=kind != "send")
+    return email_message(sub["email"], subject, html)
+
+
+def email_ref(sub, day, kind):
+    """What the retry queue keeps for a send: enough to rebuild the email,
+    nothing personal."""
+    return {"kind": kind, "user_id": sub["id"], "day": day, "date": datetime.now(ET_OFFSET).date().isoformat()}
+
+
 def send_email(to_email, subject, html):
+    """Send one email through Resend right away (send-test); the bulk paths
+    batch through email_dispatch.Dispatcher instead."""
     api_key = os.environ.get("RESEND_API_KEY")
     if not api_key:
         logger.info(f"RESEND_API_KEY not set — would send to {to_email}: {subject!r}")
         return False
     try:
-        resp = requests.post(
-            "https://api.resend.com/emails",
-            headers={"Authorization": f"Bearer {api_key}"},
-            json={"from": EMAIL_FROM, "to": [to_email], "subject": subject, "html": html},
-            timeout=30,
-        )
-        if resp.status_code in (200, 201):
-            logger.info(f"Email sent to {to_email}")
-            return True
-        logger.warning(f"Resend {resp.status_code} for {to_email}: {resp.text[:200]}")
-    except Exception as e:
-        logger.warning(f"Send failed for {to_email}: {e}")
-    return False
+        ok, detail, _ = email_dispatch.send_one(api_key, email_message(to_email, subject, html))
+    except email_dispatch.AuthError as e:
+        ok, detail = False, e
+    if ok:
+        logger.info(f"Email sent to {to_email}")
+    else:
+        logger.warning(f"Send failed for {to_email}: {detail}")
+    return ok
+
+
+def _dispatcher(retry_queue, scope=None, batch_size=EMAIL_BATCH_SIZE):
+    return email_dispatch.Dispatcher(
+        os.environ.get("RESEND_API_KEY"), EMAIL_WORKERS, EMAIL_RATE_PER_SECOND, EMAIL_BURST, batch_size,
+        retry_queue=retry_queue, idempotency_scope=scope or datetime.now(ET_OFFSET).date().isoformat(),
+    )
+
+
+def open_retry_queue():
+    return email_dispatch.RetryQueue(RETRY_QUEUE_PATH, EMAIL_RETRY_MAX_ATTEMPTS, EMAIL_RETRY_MAX_AGE_HOURS)
+
+
+def drain_retry_queue(queue, plan, sb, passes=EMAIL_RETRY_PASSES, delay=EMAIL_RETRY_DELAY_SECONDS):
+    """Rebuild and resend queued emails under their original Idempotency-Keys,
+    in up to `passes` passes; returns how many went out."""
+    sent = 0
+    for _ in range(passes):
+        if not len(queue):
+            break
+        if not sb:
+            logger.warning("Supabase not configured — can't rebuild queued emails")
+            break
+        if delay:
+            logger.info(f"{len(queue)} email(s) queued for retry — waiting {delay}s")
+            time.sleep(delay)
+        taken = queue.take()
+        subs = load_subscribers(sb, [r["user_id"] for r, _ in taken])
+        if subs is None:
+            break  # left queued for the next run
+        groups = {}  # (send date, batch key or None) -> [(message, ref)]
+        for ref, batch in taken:
+            sub = subs.get(str(ref["user_id"]))
+            message = sub and build_email(plan, sub, ref["day"], ref["kind"])
+            if not message:
+                queue.done(ref)  # unsubscribed since, or nothing to send
+                continue
+            groups.setdefault((ref["date"], batch), []).append((message, ref))
+        refused = False
+        for (date, batch), pending in groups.items():
+            with _dispatcher(queue, scope=date, batch_size=1) as d:
+                if batch:
+                    d.resend(pending, batch)
+                else:
+                    for message, ref in pending:
+                        d.add(message, ref)
+            sent += d.succeeded
+            refused = bool(d.refused)
+            if refused:
+                break
+        if refused:
+            break  # another pass would hit the same refusal
+    queue.save()
+    if len(queue):
+        logger.warning(f"{len(queue)} email(s) still queued — run --mode retry-failed to resend")
+    return sent
 
 
 def load_analysis(day):
@@ -245,14 +345,51 @@ def get_supabase_client():
         return None
 
 
-def get_subscribers(sb):
+SUBSCRIBER_COLUMNS = "id, email, start_date, current_day, gospel_start"  # all the send path reads
+SUBSCRIBER_PAGE_SIZE = 500  # under PostgREST's max-rows cap, so a page is never silently cut short
+
+
+def iter_subscriber_pages(sb, page_size=SUBSCRIBER_PAGE_SIZE):
+    """Active subscribers, one page (list) at a time, keyset-paginated on id."""
     if not sb:
-        return []
-    try:
-        return sb.table("bible_subscribers").select("*").eq("unsubscribed", False).execute().data or []
-    except Exception as e:
-        logger.warning(f"Failed to fetch subscribers: {e}")
-        return []
+        return
+    last_id = None
+    while True:
+        try:
+            q = sb.table("bible_subscribers").select(SUBSCRIBER_COLUMNS).eq("unsubscribed", False)
+            if last_id is not None:
+                q = q.gt("id", last_id)
+            page = q.order("id").limit(page_size).execute().data or []
+        except Exception as e:
+            logger.warning(f"Failed to fetch subscribers after id {last_id}: {e}")
+            return
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def load_subscribers(sb, user_ids):
+    """Active subscribers by id, {str(id): row}, PROGRESS_CHUNK_SIZE ids per
+    query. None if any query failed."""
+    ids = list(dict.fromkeys(str(u) for u in user_ids if u))
+    subs = {}
+    for i in range(0, len(ids), PROGRESS_CHUNK_SIZE):
+        chunk = ids[i:i + PROGRESS_CHUNK_SIZE]
+        try:
+            res = (sb.table("bible_subscribers").select(SUBSCRIBER_COLUMNS)
+                   .in_("id", chunk).eq("unsubscribed", False).execute())
+        except Exception as e:
+            logger.warning(f"Failed to load {len(chunk)} queued subscriber(s): {e}")
+            return None
+        subs.update((str(r["id"]), r) for r in res.data or [])
+    return subs
+
+
+def iter_subscribers(sb, page_size=SUBSCRIBER_PAGE_SIZE):
+    for page in iter_subscriber_pages(sb, page_size):
+        yield from page
 
 
 def scheduled_day(sub):
@@ -279,6 +416,44 @@ def completed_days(sb, user_id):
         return {}
 
 
+PROGRESS_CHUNK_SIZE = 100   # user_ids per in_() filter, keeps the query URL short
+PROGRESS_PAGE_SIZE = 1000   # PostgREST's default row cap per response
+
+
+def load_progress(sb, user_ids):
+    """completed_days() for many subscribers at once, {user_id: {day_number:
+    completed_at}}; ids whose chunk failed to load are left out."""
+    ids = list(dict.fromkeys(str(u) for u in user_ids if u))
+    if not sb or not ids:
+        return {}
+    progress, queries = {}, 0
+    for i in range(0, len(ids), PROGRESS_CHUNK_SIZE):
+        chunk = ids[i:i + PROGRESS_CHUNK_SIZE]
+        found = {uid: {} for uid in chunk}
+        try:
+            offset = 0
+            while True:
+                res = (sb.table("bible_reading_progress")
+                       .select("user_id, day_number, completed_at")
+                       .in_("user_id", chunk).eq("completed", True)
+                       .order("user_id").order("day_number")
+                       .range(offset, offset + PROGRESS_PAGE_SIZE - 1)
+                       .execute())
+                queries += 1
+                rows = res.data or []
+                for r in rows:
+                    found[str(r["user_id"])][r["day_number"]] = r.get("completed_at")
+                if len(rows) < PROGRESS_PAGE_SIZE:
+                    break
+                offset += PROGRESS_PAGE_SIZE
+        except Exception as e:
+            logger.warning(f"Failed to load progress for {len(chunk)} subscriber(s), will query them one by one: {e}")
+            continue
+        progress.update(found)
+    logger.info(f"Loaded reading progress for {len(progress)} subscriber(s) in {queries} quer{'y' if queries == 1 else 'ies'}")
+    return progress
+
+
 # --- Reading order ---------------------------------------------------------
 # Kept deliberately in step with readingOrder() in bible/app.js. Position in the
 # plan used to be implied by day_number; making it explicit is what lets a
@@ -331,14 +506,16 @@ def reading_order(plan, done, gospel_start, base):
     return rest[:offset] + gospels + rest[offset:]
 
 
-def email_day_for(sb, sub, plan):
+def email_day_for(sb, sub, plan, done=None):
     """The day to email: the next reading in this subscriber's own order, unless
     they're already level with the one-per-day calendar — nobody gets tomorrow's
     reading early or two new days in a day. (Falling behind still resends the
     oldest outstanding reading.) Counting readings rather than comparing day
-    numbers is what survives a gospel jump; read in order the two are identical."""
+    numbers is what survives a gospel jump; read in order the two are identical.
+    done is the subscriber's completed_days(), if already loaded in bulk."""
     sched = scheduled_day(sub)
-    done = completed_days(sb, sub["id"])
+    if done is None:
+        done = completed_days(sb, sub["id"])
     if len(done) >= sched:
         return None
     order = reading_order(plan, done, sub.get("gospel_start"), upcoming_base(done))
@@ -398,24 +575,25 @@ def run_send(plan):
     """Daily send: each subscriber gets their oldest unread day (resending a
     missed day rather than marching past it)."""
     sb = get_supabase_client()
-    subs = get_subscribers(sb)
-    if not subs:
+    seen = 0
+    queue = open_retry_queue()
+    with _dispatcher(queue) as d:
+        for page in iter_subscriber_pages(sb):
+            seen += len(page)
+            progress = load_progress(sb, [s["id"] for s in page])
+            for sub in page:
+                day = email_day_for(sb, sub, plan, progress.get(str(sub["id"])))
+                if day is None:
+                    logger.info(f"{sub.get('email')} is caught up — no email today")
+                    continue
+                message = build_email(plan, sub, day, "send")
+                if not message:
+                    logger.warning(f"Day {day} not generated yet — skipping {sub.get('email')}")
+                    continue
+                d.add(message, email_ref(sub, day, "send"))
+    sent = d.succeeded + drain_retry_queue(queue, plan, sb)
+    if not seen:
         logger.info("No subscribers")
-        return
-    sent = 0
-    for sub in subs:
-        day = email_day_for(sb, sub, plan)
-        if day is None:
-            logger.info(f"{sub.get('email')} is caught up — no email today")
-            continue
-        entry, analysis = get_entry_by_day(plan, day), load_analysis(day)
-        if not entry or not analysis:
-            logger.warning(f"Day {day} not generated yet — skipping {sub.get('email')}")
-            continue
-        uid = sub["id"]
-        subject = f"Day {day}: {entry['passage']}" + (f" — {analysis['title']}" if analysis.get("title") else "")
-        if send_email(sub["email"], subject, render_email(entry, analysis, plan, uid)):
-            sent += 1
     logger.info(f"Sent {sent} email(s)")
 
 
@@ -423,8 +601,7 @@ def run_daily(plan):
     """Cheap daily run: generate only the day(s) due so far that are missing
     (normally just one), then send. Replaces the all-at-once backfill."""
     sb = get_supabase_client()
-    subs = get_subscribers(sb)
-    target = max([scheduled_day(s) for s in subs], default=1)
+    target = max((scheduled_day(s) for s in iter_subscribers(sb)), default=1)
     logger.info(f"Daily: ensuring days 1..{target} are generated, then sending")
 
     prior = []
@@ -457,32 +634,43 @@ def run_send_test(plan, day, to_email):
     logger.info(f"Test email to {to_email}: {'sent' if ok else 'not sent (check RESEND_API_KEY)'}")
 
 
+def run_retry_failed(plan):
+    """Resend whatever earlier runs left in the retry queue, straight away."""
+    queue = open_retry_queue()
+    if not len(queue):
+        logger.info("Retry queue is empty")
+        return
+    logger.info(f"Retrying {len(queue)} queued email(s)")
+    sent = drain_retry_queue(queue, plan, get_supabase_client(), delay=0)
+    logger.info(f"Sent {sent} email(s)")
+
+
 def run_reminders(plan, kind):
     sb = get_supabase_client()
-    subs = get_subscribers(sb)
-    if not subs:
+    seen = 0
+    queue = open_retry_queue()
+    with _dispatcher(queue) as d:
+        for page in iter_subscriber_pages(sb):
+            seen += len(page)
+            progress = load_progress(sb, [s["id"] for s in page])
+            for sub in page:
+                day = email_day_for(sb, sub, plan, progress.get(str(sub["id"])))
+                if day is None:
+                    continue  # caught up — no nudge needed
+                message = build_email(plan, sub, day, kind)
+                if message:
+                    d.add(message, email_ref(sub, day, kind))
+    sent = d.succeeded + drain_retry_queue(queue, plan, sb)  # even with no subscribers, as in run_send
+    if not seen:
         logger.info("No subscribers for reminders")
-        return
-    sent = 0
-    for sub in subs:
-        day = email_day_for(sb, sub, plan)
-        if day is None:
-            continue  # caught up — no nudge needed
-        entry, analysis = get_entry_by_day(plan, day), load_analysis(day)
-        if not entry or not analysis:
-            continue
-        uid = sub["id"]
-        word = "waiting for you" if kind == "evening" else "before today's reading"
-        subject = f"Day {day}: {entry['passage']} is {word}"
-        send_email(sub["email"], subject, render_email(entry, analysis, plan, uid, reminder=True))
-        sent += 1
     logger.info(f"Sent {sent} {kind} reminders")
 
 
 def main():
     p = argparse.ArgumentParser(description="Bible Reading Plan Generator")
     p.add_argument("--mode", default="daily",
-                   choices=["daily", "backfill", "day", "send", "send-test", "remind-evening", "remind-morning"])
+                   choices=["daily", "backfill", "day", "send", "send-test", "remind-evening", "remind-morning",
+                            "retry-failed"])
     p.add_argument("--day", type=int, default=None)
     p.add_argument("--to", default=None, help="recipient for send-test")
     args = p.parse_args()
@@ -506,6 +694,8 @@ def main():
         run_reminders(plan, "evening")
     elif args.mode == "remind-morning":
         run_reminders(plan, "morning")
+    elif args.mode == "retry-failed":
+        run_retry_failed(plan)
 
 
 if __name__ == "__main__":
@@ -11,28 +11,99 @@ Environment variables required:
     RESEND_API_KEY - Resend API key (optional, skips email if missing)
 """
 
+import argparse
+import hashlib
 import json
 import logging
 import os
 import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from urllib.parse import urlparse
 
 import feedparser
 import requests
-from jinja2 import Template
+from requests.adapters import HTTPAdapter
+from jinja2 import DictLoader, Environment, FileSystemBytecodeCache
 from openai import OpenAI
 
 # Add scripts directory to path for config import
 sys.path.insert(0, str(Path(__file__).parent))
+import atomic_file
+import email_dispatch
+import enrichment
+import feed_cache
+import feed_health
+import host_scheduler
+import llm_cache
+import llm_hedge
+from article_store import canonical_url, filter_new, open_store, record_published
+import prompt_packer
+import relevance
+import run_metrics
+from story_clusters import attach_cluster_sources, cluster_articles, merge_cluster
 from config import (
-    ARCHIVE_ITEM_TEMPLATE,
-    INDEX_DIGEST_TEMPLATE,
+    ARCHIVE_PAGE_SIZE,
+    CLUSTER_SIMILARITY_THRESHOLD,
+    CURATION_MAP_MODEL,
+    CURATION_MAP_WORKERS,
+    CURATION_MODE,
+    CURATION_OUTPUT,
+    CURATION_SHARD_SIZE,
+    CURATION_SHARDS,
+    DEPRIORITIZE_PATTERNS,
+    ENRICH_ARTICLES,
+    ENRICH_EXCERPT_TOKENS,
+    ENRICH_PER_HOST,
+    ENRICH_SKIP_HOSTS,
+    ENRICH_TIME_BUDGET_SECONDS,
+    ENRICH_TIMEOUT_SECONDS,
+    ENRICH_WORKERS,
+    FEED_BACKOFF_BASE_HOURS,
+    FEED_BACKOFF_MAX_HOURS,
+    FEED_EMPTY_BACKOFF_MAX_HOURS,
+    FEED_EMPTY_THRESHOLD,
+    FEED_FAILURE_THRESHOLD,
+    FEED_USER_AGENT,
+    FETCH_DEADLINE_SECONDS,
+    FETCH_HOST_LIMITS,
+    FETCH_HOST_MIN_INTERVAL_SECONDS,
+    FETCH_PER_HOST,
+    FETCH_TIMEOUT_SECONDS,
+    FETCH_WINDOW_HOURS,
+    FETCH_WORKERS,
+    INDEXED_SYSTEM_PROMPT,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTL_HOURS,
+    LLM_DEADLINE_SECONDS,
+    LLM_HEDGE_API_KEY_ENV,
+    LLM_HEDGE_BASE_URL,
+    LLM_HEDGE_DEFAULT_SECONDS,
+    LLM_HEDGE_MIN_SECONDS,
+    LLM_HEDGE_MODEL,
+    LLM_HEDGE_PERCENTILE,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS,
+    MAP_SYSTEM_PROMPT,
+    MAP_USER_PROMPT_TEMPLATE,
     MAX_ARTICLES_PER_FEED,
-    POST_TEMPLATE,
+    NOOP_ACTION,
+    PRIORITY_KEYWORDS,
+    PROMPT_TOKEN_BUDGET,
+    REDUCE_USER_PROMPT_TEMPLATE,
+    RELEVANCE_KEEP_RATIO,
+    RELEVANCE_MIN_KEEP,
     RSS_FEEDS,
+    SOURCE_PRIORITY,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_MIN_TOKENS,
     SYSTEM_PROMPT,
+    TEMPLATES,
+    TRACKED_COMPANIES,
     USER_PROMPT_TEMPLATE,
 )
 
@@ -44,316 +115,897 @@ REPO_ROOT = Path(__file__).parent.parent
 DIGEST_DIR = REPO_ROOT / "digest"
 POSTS_DIR = DIGEST_DIR / "posts"
 INDEX_PATH = DIGEST_DIR / "index.html"
+MANIFEST_PATH = DIGEST_DIR / "archive.json"  # {date_iso: top story title}, newest first
+ARCHIVE_DIR = DIGEST_DIR / "archive"  # one page per month
+
+# Local state carried between runs (restored/saved by the workflow's cache step)
+CACHE_DIR = REPO_ROOT / ".cache" / "digest"
+FEED_CACHE_DIR = CACHE_DIR / "feeds"
+FEED_HEALTH_PATH = CACHE_DIR / "feed_health.json"
+ARTICLE_STORE_PATH = CACHE_DIR / "articles.sqlite3"
+PACK_REPORT_PATH = CACHE_DIR / "pack_report.json"
+LLM_CACHE_DIR = CACHE_DIR / "llm"
+LLM_LATENCY_PATH = CACHE_DIR / "llm_latency.json"
+PAGE_CACHE_DIR = CACHE_DIR / "pages"
+LAST_INPUT_PATH = CACHE_DIR / "last_input.json"  # input of the last successful digest
+JINJA_CACHE_DIR = CACHE_DIR / "jinja"
+
+FEED_BREAKER_POLICY = {
+    "failure_threshold": FEED_FAILURE_THRESHOLD,
+    "empty_threshold": FEED_EMPTY_THRESHOLD,
+    "backoff_base_hours": FEED_BACKOFF_BASE_HOURS,
+    "backoff_max_hours": FEED_BACKOFF_MAX_HOURS,
+    "empty_backoff_max_hours": min(FEED_EMPTY_BACKOFF_MAX_HOURS, FETCH_WINDOW_HOURS - 1),
+}
+
+
+def _jinja_env():
+    """One Environment for every digest template (see config.TEMPLATES).
+
+    Compiled templates are kept in a bytecode cache, keyed by source checksum,
+    so later runs skip Jinja's parse/compile step.
+    """
+    bytecode_cache = None
+    try:
+        JINJA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(JINJA_CACHE_DIR))
+    except OSError as e:
+        logger.warning(f"Jinja bytecode cache unavailable: {e}")
+    return Environment(loader=DictLoader(TEMPLATES), bytecode_cache=bytecode_cache)
+
+
+JINJA_ENV = _jinja_env()
+
+
+def _entry_records(feed):
+    """Reduce parsed feed entries to the plain dicts we cache and collect from."""
+    records = []
+    for entry in feed.entries:
+        # Parse publish date
+        published = None
+        if hasattr(entry, "published_parsed") and entry.published_parsed:
+            published = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
+        elif hasattr(entry, "updated_parsed") and entry.updated_parsed:
+            published = datetime(*entry.updated_parsed[:6], tzinfo=timezone.utc)
+
+        # Extract summary text, strip HTML tags
+        summary = getattr(entry, "summary", "") or getattr(entry, "description", "")
+        summary = re.sub(r"<[^>]+>", "", summary)
+
+        records.append(
+            {
+                "title": getattr(entry, "title", "Untitled"),
+                "link": getattr(entry, "link", ""),
+                "summary": summary,
+                "published": published.isoformat() if published else "",
+            }
+        )
+    return records
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _feed_session():
+    """One pooled Session shared by the fetch workers: keep-alive connections
+    are reused across feeds on the same host, up to FETCH_PER_HOST per host."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=64, pool_maxsize=max([FETCH_PER_HOST] + [cap for cap, _ in FETCH_HOST_LIMITS.values()])
+            )
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _host_limits(host):
+    return FETCH_HOST_LIMITS.get(host, (FETCH_PER_HOST, FETCH_HOST_MIN_INTERVAL_SECONDS))
+
+
+def _feed_priority(fc):
+    return fc.get("priority", SOURCE_PRIORITY.get(fc["name"], 1.0))
+
+
+def _fetch_feed(url):
+    """Download and parse a single feed; returns {"entries", "status", "bytes", "seconds"}."""
+    started = time.monotonic()
+    cached = feed_cache.load(FEED_CACHE_DIR, url)
+    headers = {"User-Agent": FEED_USER_AGENT, **feed_cache.conditional_headers(cached)}
+    resp = _feed_session().get(url, headers=headers, timeout=FETCH_TIMEOUT_SECONDS)
+    if resp.status_code == 304 and cached:
+        return {"entries": cached["entries"], "status": "not-modified", "bytes": 0, "seconds": time.monotonic() - started}
+    resp.raise_for_status()
+
+    content_hash = feed_cache.body_hash(resp.content)
+    if cached and cached.get("body_hash") == content_hash:
+        entries, status = cached["entries"], "unchanged"
+    else:
+        response_headers = {k.lower(): v for k, v in resp.headers.items()}
+        response_headers["content-location"] = resp.url  # lets feedparser resolve relative links
+        entries, status = _entry_records(feedparser.parse(resp.content, response_headers=response_headers)), "fetched"
+    feed_cache.save(
+        FEED_CACHE_DIR, url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), content_hash, entries
+    )
+    return {"entries": entries, "status": status, "bytes": len(resp.content), "seconds": time.monotonic() - started}
+
+
+def _collect_entries(entries, source, cutoff, seen_urls):
+    """Turn one feed's entry records into article dicts, skipping old and already-seen links."""
+    articles = []
+    for entry in entries:
+        if len(articles) >= MAX_ARTICLES_PER_FEED:  # cap articles taken from this feed
+            break
+        published = datetime.fromisoformat(entry["published"]) if entry["published"] else None
+
+        # Skip old articles
+        if published and published < cutoff:
+            continue
+
+        key = canonical_url(entry["link"])  # dedupe key only; readers get the publisher's link
+        if key in seen_urls:
+            continue
+        seen_urls.add(key)
+
+        articles.append(
+            {
+                "title": entry["title"],
+                "url": entry["link"],
+                "canonical_url": key,
+                "source": source,
+                "summary": entry["summary"],  # trimmed by token count when the prompt is packed
+                "published": entry["published"],
+            }
+        )
+    return articles
 
 
 def fetch_articles():
-    """Fetch recent articles from all configured RSS feeds."""
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=28)  # 28h window for overlap
+    """Fetch recent articles from all configured RSS feeds, concurrently and
+    within FETCH_DEADLINE_SECONDS, skipping feeds whose breaker is open."""
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(hours=FETCH_WINDOW_HOURS)
+    started = time.monotonic()
+    health = feed_health.load(FEED_HEALTH_PATH)
+    outcomes = dict.fromkeys(["fetched", "not modified", "circuit open", "not started", "failed"], 0)
+
+    active = []
+    for fc in RSS_FEEDS:
+        rec = feed_health.record_for(health, fc["url"], fc["name"])
+        if feed_health.is_open(rec, now):
+            logger.info(f"Skipped {fc['name']}: circuit open until {rec['open_until'][:16]}")
+            run_metrics.record_feed(fc["name"], status="circuit-open")
+            outcomes["circuit open"] += 1
+            continue
+        active.append(fc)
+
+    by_priority = sorted(range(len(active)), key=lambda i: -_feed_priority(active[i]))  # stable: ties keep list order
+    results, in_flight, unstarted = host_scheduler.run(
+        [(i, active[i]["url"]) for i in by_priority], _fetch_feed, FETCH_WORKERS, _host_limits, FETCH_DEADLINE_SECONDS
+    )
+    in_flight, unstarted = set(in_flight), set(unstarted)
+
     articles = []
     seen_urls = set()
-
-    for feed_config in RSS_FEEDS:
+    for i, feed_config in enumerate(active):
         url = feed_config["url"]
         source = feed_config["name"]
+        rec = health[url]
+        if i in unstarted:
+            logger.warning(f"Skipped {source} ({url}): not started by the {FETCH_DEADLINE_SECONDS}s deadline")
+            run_metrics.record_feed(source, status="not-started")
+            outcomes["not started"] += 1
+            continue
+        if i in in_flight:
+            logger.warning(f"Skipped {source} ({url}): still fetching at the {FETCH_DEADLINE_SECONDS}s deadline")
+            run_metrics.record_feed(source, status="deadline")
+            feed_health.record_failure(rec, now, f"still fetching at the {FETCH_DEADLINE_SECONDS}s deadline", FEED_BREAKER_POLICY)
+            outcomes["failed"] += 1
+            continue
+        ok, result = results[i]
+        if not ok:
+            logger.warning(f"Failed to fetch {source} ({url}): {result}")
+            run_metrics.record_feed(source, status="failed", error=str(result)[:200])
+            feed_health.record_failure(rec, now, result, FEED_BREAKER_POLICY)
+            outcomes["failed"] += 1
+            continue
+        feed_articles = _collect_entries(result["entries"], source, cutoff, seen_urls)
+        articles.extend(feed_articles)
+        status = result["status"]
+        outcomes["fetched" if status == "fetched" else "not modified"] += 1  # "unchanged" bodies count as not modified
+        run_metrics.record_feed(
+            source, status=status, bytes=result["bytes"], seconds=round(result["seconds"], 3),
+            entries=len(result["entries"]) if status == "fetched" else 0, fresh=len(feed_articles),
+        )
+        empty = status == "fetched" and not result["entries"]
+        feed_health.record_success(rec, now, result["seconds"], len(feed_articles), empty, FEED_BREAKER_POLICY)
+        logger.info(f"Fetched {len(feed_articles)} recent entries from {source}" + ("" if status == "fetched" else f" ({status})"))
+
+    feed_health.save(FEED_HEALTH_PATH, health)
+    run_metrics.count("articles_collected", len(articles))
+    logger.info(
+        f"Total articles collected: {len(articles)} from {len(RSS_FEEDS)} feeds in {time.monotonic() - started:.1f}s "
+        f"({', '.join(f'{n} {outcome}' for outcome, n in outcomes.items())})"
+    )
+    return articles
+
+
+def drop_seen_articles(articles, date_obj):
+    """Keep only articles not already sent in an earlier day's digest."""
+    try:
+        conn = open_store(ARTICLE_STORE_PATH)
+    except Exception as e:
+        logger.warning(f"Article store unavailable ({e}); skipping cross-run dedupe")
+        return articles
+    try:
+        fresh = filter_new(conn, articles, date_obj.strftime("%Y-%m-%d"))
+    finally:
+        conn.close()
+    run_metrics.count("articles_new", len(fresh))
+    logger.info(f"Article store: {len(fresh)} new, {len(articles) - len(fresh)} already seen in earlier digests")
+    return fresh
+
+
+def record_published_articles(articles, date_obj):
+    """Mark the day's input articles as seen, once its post is written.
+
+    Called only after publishing, so a run that fails before then leaves its
+    articles eligible for the next day's digest.
+    """
+    try:
+        conn = open_store(ARTICLE_STORE_PATH)
         try:
-            feed = feedparser.parse(url)
-            feed_count = 0  # cap articles taken from this feed
-            for entry in feed.entries:
-                if feed_count >= MAX_ARTICLES_PER_FEED:
-                    break
-                # Parse publish date
-                published = None
-                if hasattr(entry, "published_parsed") and entry.published_parsed:
-                    published = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-                elif hasattr(entry, "updated_parsed") and entry.updated_parsed:
-                    published = datetime(*entry.updated_parsed[:6], tzinfo=timezone.utc)
-
-                # Skip old articles
-                if published and published < cutoff:
-                    continue
-
-                link = getattr(entry, "link", "")
-                if link in seen_urls:
-                    continue
-                seen_urls.add(link)
-
-                # Extract summary text, strip HTML tags
-                summary = getattr(entry, "summary", "") or getattr(entry, "description", "")
-                summary = re.sub(r"<[^>]+>", "", summary)
-                summary = summary[:500]  # Truncate long summaries
-
-                articles.append(
-                    {
-                        "title": getattr(entry, "title", "Untitled"),
-                        "url": link,
-                        "source": source,
-                        "summary": summary,
-                        "published": published.isoformat() if published else "",
-                    }
-                )
-                feed_count += 1
-            logger.info(f"Fetched {feed_count} recent entries from {source}")
-        except Exception as e:
-            logger.warning(f"Failed to fetch {source} ({url}): {e}")
+            record_published(conn, articles, date_obj.strftime("%Y-%m-%d"), date_obj.isoformat())
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"Could not record articles in the article store: {e}")
 
-    logger.info(f"Total articles collected: {len(articles)}")
-    return articles
 
+def group_stories(articles):
+    """Collapse near-duplicate coverage into one entry per story (see story_clusters)."""
+    stories = [merge_cluster(c) for c in cluster_articles(articles, CLUSTER_SIMILARITY_THRESHOLD)]
+    merged = len(articles) - len(stories)
+    run_metrics.count("stories", len(stories))
+    if merged:
+        logger.info(f"Clustered {len(articles)} articles into {len(stories)} stories ({merged} duplicates folded)")
+    return stories
 
-def curate_with_gpt(articles):
-    """Send articles to GPT-4o for curation and summarization."""
-    if len(articles) < 3:
-        logger.info("Fewer than 3 articles found — quiet day")
-        return {"quiet_day": True, "message": "Not much happened in AI, startups, or health tech today. Check back tomorrow."}
 
-    # Format articles for the prompt
-    articles_text = ""
-    for i, a in enumerate(articles, 1):
-        articles_text += f"{i}. [{a['source']}] {a['title']}\n   URL: {a['url']}\n   {a['summary']}\n\n"
-
-    client = OpenAI()
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": USER_PROMPT_TEMPLATE.format(articles=articles_text)},
-        ],
-        response_format={"type": "json_object"},
-        temperature=0.3,
+def prefilter_stories(stories):
+    """Drop the least relevant stories before curation (see relevance)."""
+    scores = relevance.score_stories(
+        stories, PRIORITY_KEYWORDS + TRACKED_COMPANIES, SOURCE_PRIORITY, DEPRIORITIZE_PATTERNS
+    )
+    kept, dropped = relevance.prefilter(stories, scores, RELEVANCE_KEEP_RATIO, RELEVANCE_MIN_KEEP)
+    run_metrics.count("stories_prefiltered_out", len(dropped))
+    if dropped:
+        logger.info(f"Relevance prefilter kept {len(kept)}/{len(stories)} stories")
+        for score, story in dropped:
+            logger.info(f"  prefiltered ({score:.2f}): [{story['source']}] {story['title']}")
+    return kept
+
+
+def enrich_stories(stories):
+    """Add an excerpt of each story's article page, within the time budget (see enrichment)."""
+    targets = [s for s in stories if urlparse(s["url"]).netloc.lower() not in ENRICH_SKIP_HOSTS]
+    enrichment.prune_cache(PAGE_CACHE_DIR)
+    started = time.monotonic()
+    stats = enrichment.enrich(
+        targets, PAGE_CACHE_DIR, ENRICH_WORKERS, ENRICH_PER_HOST, ENRICH_TIMEOUT_SECONDS,
+        ENRICH_TIME_BUDGET_SECONDS, FEED_USER_AGENT,
+        lambda text: prompt_packer.truncate_tokens(text, ENRICH_EXCERPT_TOKENS),
+    )
+    enriched = sum(1 for s in targets if s.get("excerpt"))
+    run_metrics.count("stories_enriched", enriched)
+    logger.info(
+        f"Enriched {enriched}/{len(stories)} stories with article text in {time.monotonic() - started:.1f}s "
+        f"({stats['cached']} cached, {stats['fetched']} fetched, {stats['failed']} failed, "
+        f"{stats['unfinished']} unfinished at the {ENRICH_TIME_BUDGET_SECONDS}s budget)"
+    )
+    return stories
+
+
+def _format_story(i, story, urls=True):
+    """One numbered prompt entry; multi-source stories list every outlet and URL.
+
+    With urls False (indexed output) the entry names the outlets but carries
+    no URLs at all: the model can only cite the number, and expand_references
+    takes every source's URL from the cluster.
+    """
+    sources = story.get("sources") or [story]
+    outlets = ", ".join(dict.fromkeys(s["source"] for s in sources))
+    text = f"{i}. [{outlets}] {story['title']}\n"
+    if urls:
+        text += f"   URL: {story['url']}\n"
+        for s in sources:
+            if s["url"] != story["url"]:
+                text += f"   Also: {s['url']} ({s['source']})\n"
+    text += f"   {story['summary']}\n"
+    if story.get("excerpt"):
+        text += f"   From the article: {story['excerpt']}\n"
+    return text + "\n"
+
+
+def _format_indexed_story(i, story):
+    return _format_story(i, story, urls=False)
+
+
+def pack_prompt(stories, system_prompt=SYSTEM_PROMPT, user_template=USER_PROMPT_TEMPLATE, formatter=_format_story):
+    """Fit the numbered story list into PROMPT_TOKEN_BUDGET (see prompt_packer).
+
+    Returns the stories that made it in and the prompt text for them, and
+    records what was kept and cut in PACK_REPORT_PATH.
+    """
+    now = datetime.now(timezone.utc)
+    overhead = prompt_packer.count_tokens(system_prompt) + prompt_packer.count_tokens(user_template.format(articles=""))
+    scores = [prompt_packer.story_score(s, SOURCE_PRIORITY, PRIORITY_KEYWORDS, FETCH_WINDOW_HOURS, now) for s in stories]
+    packed, articles_text, report = prompt_packer.pack(
+        stories, formatter, PROMPT_TOKEN_BUDGET, overhead, SUMMARY_MAX_TOKENS, SUMMARY_MIN_TOKENS, scores
+    )
+    logger.info(
+        f"Packed {report['stories_packed']}/{report['stories_in']} stories into "
+        f"{report['prompt_tokens']}/{report['budget']} tokens ({report['tokenizer']}); "
+        f"{len(report['shortened'])} shortened, {len(report['dropped'])} dropped"
+    )
+    for title in report["dropped"]:
+        logger.info(f"  dropped: {title}")
+    run_metrics.count("stories_packed", report["stories_packed"])
+    run_metrics.count("prompt_tokens_packed", report["prompt_tokens"])
+    try:
+        atomic_file.write(PACK_REPORT_PATH, json.dumps(report, indent=2, ensure_ascii=False))
+    except OSError as e:
+        logger.warning(f"Could not write pack report: {e}")
+    return packed, articles_text
+
+
+_llm_history_lock = threading.Lock()
+
+
+def _openai_call(messages, params):
+    """call(target, timeout) for llm_hedge.run: one un-retried request to target."""
+    def call(target, timeout):
+        client = OpenAI(base_url=target.get("base_url"), api_key=target.get("api_key"), timeout=timeout, max_retries=0)
+        return client.chat.completions.create(model=target["model"], messages=messages, **params)
+    return call
+
+
+def chat_completion(messages, model="gpt-4o", use_cache=True, **params):
+    """One JSON-mode chat completion, from the LLM cache if possible, else
+    through llm_hedge."""
+    params = {"response_format": {"type": "json_object"}, "temperature": 0.3, **params}
+    key = llm_cache.request_key(model, messages, **params)
+    ttl = LLM_CACHE_TTL_HOURS * 3600
+    if use_cache:
+        cached = llm_cache.get(LLM_CACHE_DIR, key, ttl)
+        if cached is not None:
+            logger.info(f"LLM cache hit ({key[:12]}), skipping {model} call")
+            run_metrics.record_llm(cache_hit=True)
+            return cached
+
+    primary = {"model": model}
+    hedge = {"model": LLM_HEDGE_MODEL or model}
+    if LLM_HEDGE_BASE_URL:
+        hedge.update(base_url=LLM_HEDGE_BASE_URL, api_key=os.environ.get(LLM_HEDGE_API_KEY_ENV))
+    with _llm_history_lock:
+        history = llm_hedge.load_history(LLM_LATENCY_PATH)
+    hedge_after = llm_hedge.threshold(history, model, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SECONDS, LLM_HEDGE_DEFAULT_SECONDS)
+
+    response, outcome = llm_hedge.run(
+        _openai_call(messages, params), primary, hedge, LLM_DEADLINE_SECONDS, hedge_after,
+        LLM_MAX_RETRIES, LLM_RETRY_BASE_SECONDS,
     )
-
     content = response.choices[0].message.content
-    digest_data = json.loads(content)
-    logger.info("GPT-4o curation complete")
+    run_metrics.record_llm(response.usage, outcome["seconds"])
+    run_metrics.record_llm_outcome(outcome)
+    if outcome["hedged"] or outcome["attempt"] > 1:
+        logger.info(f"LLM answer from {outcome['winner']} ({outcome['model']}, attempt {outcome['attempt']}) after {outcome['seconds']:.1f}s")
+    with _llm_history_lock:
+        history = llm_hedge.load_history(LLM_LATENCY_PATH)  # other shards may have written since
+        llm_hedge.record(history, outcome["model"], {
+            "seconds": outcome["seconds"], "winner": outcome["winner"], "hedge_after": outcome["hedge_after"],
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        })
+        llm_hedge.save_history(LLM_LATENCY_PATH, history)
+    llm_cache.put(LLM_CACHE_DIR, key, content, ttl, LLM_CACHE_MAX_ENTRIES, model=outcome["model"])
+    return content
+
+
+def _screen_shard(shard, use_cache):
+    """Map step: have CURATION_MAP_MODEL pick the notable stories in one shard.
+
+    Returns the kept stories with the model's category, importance and note
+    folded into the summary, so the reduce prompt is a short list of
+    pre-digested stories that still carry their real titles and URLs.
+    """
+    overhead = prompt_packer.count_tokens(MAP_SYSTEM_PROMPT) + prompt_packer.count_tokens(MAP_USER_PROMPT_TEMPLATE.format(articles=""))
+    scores = [prompt_packer.story_score(s, SOURCE_PRIORITY, PRIORITY_KEYWORDS, FETCH_WINDOW_HOURS) for s in shard]
+    packed, articles_text, _ = prompt_packer.pack(
+        shard, _format_story, PROMPT_TOKEN_BUDGET, overhead, SUMMARY_MAX_TOKENS, SUMMARY_MIN_TOKENS, scores
+    )
+    messages = [
+        {"role": "system", "content": MAP_SYSTEM_PROMPT},
+        {"role": "user", "content": MAP_USER_PROMPT_TEMPLATE.format(articles=articles_text)},
+    ]
+    content = chat_completion(messages, model=CURATION_MAP_MODEL, use_cache=use_cache, temperature=0.0)
+    kept = []
+    for item in json.loads(content).get("items", []):
+        try:
+            story = packed[int(item["id"]) - 1]
+        except (KeyError, ValueError, TypeError, IndexError):
+            continue
+        note = item.get("note") or story["summary"]
+        kept.append({**story, "summary": f"[{item.get('category', 'other')}, importance {item.get('importance', '?')}/5] {note}"})
+    return kept
+
+
+def map_reduce_candidates(stories, use_cache=True):
+    """Screen stories in parallel shards and return the ones worth curating.
+
+    A shard whose call fails contributes its stories unscreened; the reduce
+    step's packing keeps the prompt within budget either way.
+    """
+    n_shards = min(CURATION_SHARDS, -(-len(stories) // CURATION_SHARD_SIZE))
+    shards = [stories[i::n_shards] for i in range(n_shards)]  # dealt round-robin so sizes and sources even out
+    logger.info(f"Map-reduce curation: {len(stories)} stories in {len(shards)} shards, {CURATION_MAP_WORKERS} at a time")
+
+    with ThreadPoolExecutor(max_workers=CURATION_MAP_WORKERS, thread_name_prefix="curate-map") as pool:
+        futures = [pool.submit(_screen_shard, shard, use_cache) for shard in shards]
+    candidates = []
+    for i, (shard, future) in enumerate(zip(shards, futures), 1):
+        try:
+            kept = future.result()
+        except Exception as e:
+            logger.warning(f"Shard {i}/{len(shards)} screening failed ({e}); passing its {len(shard)} stories through")
+            kept = shard
+        logger.info(f"  shard {i}: kept {len(kept)}/{len(shard)}")
+        candidates.extend(kept)
+    run_metrics.count("curation_shards", len(shards))
+    run_metrics.count("stories_screened_in", len(candidates))
+    return candidates
+
+
+def _ref(story):
+    return {"title": story["title"], "url": story["url"], "source": story["source"]}
+
+
+def expand_references(digest_data, stories):
+    """Turn indexed curation output back into the full shape the templates use."""
+    def story_at(n):
+        try:
+            n = int(n)
+        except (TypeError, ValueError):
+            return None
+        return stories[n - 1] if 1 <= n <= len(stories) else None
+
+    invalid = []
+
+    def articles(numbers):
+        refs = []
+        for n in numbers or []:
+            story = story_at(n)
+            if story is None:
+                invalid.append(n)
+                continue
+            refs.extend(_ref(s) for s in story.get("sources") or [story])
+        return list({r["url"]: r for r in refs}.values())  # a story cited twice is credited once
+
+    for block in [digest_data.get("top_story")] + list(digest_data.get("sections") or []):
+        if block:
+            block["articles"] = articles(block.get("articles"))
+    for key in ("funding_rounds", "product_launches", "stealth_launches", "health_tech"):
+        items = []
+        for item in digest_data.get(key) or []:
+            story = story_at(item.get("article"))
+            if story is None:
+                invalid.append(item.get("article"))
+                continue
+            items.append({"text": item.get("text", ""), "url": story["url"], "source": story["source"]})
+        digest_data[key] = items
+    if invalid:
+        logger.warning(f"Dropped {len(invalid)} references to article numbers not in the prompt: {invalid}")
     return digest_data
 
 
-def generate_post_html(digest_data, date_obj):
-    """Generate the individual post HTML file."""
-    date_iso = date_obj.strftime("%Y-%m-%d")
-    date_formatted = date_obj.strftime("%B %d, %Y")
+def curate_with_gpt(stories, use_cache=True, mode=CURATION_MODE):
+    """Send stories to GPT-4o for curation and summarization."""
+    if len(stories) < 3:
+        logger.info("Fewer than 3 stories found — quiet day")
+        return {"quiet_day": True, "message": "Not much happened in AI, startups, or health tech today. Check back tomorrow."}
 
-    template = Template(POST_TEMPLATE)
-
-    if digest_data.get("quiet_day"):
-        html = template.render(
-            date_iso=date_iso,
-            date_formatted=date_formatted,
-            quiet_day=True,
-            quiet_message=digest_data.get("message", "Quiet day."),
-            top_story_title="Quiet news day",
-            top_story=None,
-            sections=[],
-        )
-    else:
-        top_story = digest_data["top_story"]
-        sections = digest_data.get("sections", [])
-        html = template.render(
-            date_iso=date_iso,
-            date_formatted=date_formatted,
-            quiet_day=False,
-            quiet_message="",
-            top_story_title=top_story["title"],
-            top_story=top_story,
+    user_template = USER_PROMPT_TEMPLATE
+    if mode == "map-reduce" and len(stories) > CURATION_SHARD_SIZE:
+        candidates = map_reduce_candidates(stories, use_cache=use_cache)
+        if candidates:
+            stories, user_template = candidates, REDUCE_USER_PROMPT_TEMPLATE
+        else:
+            logger.warning("Map step kept no stories; curating the full list in one call instead")
+
+    indexed = CURATION_OUTPUT == "indexed"
+    system_prompt = INDEXED_SYSTEM_PROMPT if indexed else SYSTEM_PROMPT
+    formatter = _format_indexed_story if indexed else _format_story
+    stories, articles_text = pack_prompt(stories, system_prompt, user_template, formatter)
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_template.format(articles=articles_text)},
+    ]
+    digest_data = json.loads(chat_completion(messages, use_cache=use_cache))
+    if not digest_data.get("quiet_day"):
+        digest_data = expand_references(digest_data, stories) if indexed else attach_cluster_sources(digest_data, stories)
+    logger.info("GPT-4o curation complete")
+    return digest_data
+
+
+def _write_output(path, text):
+    """Write a generated file and count its bytes in the run metrics.
+
+    A file whose bytes wouldn't change is left alone, so its mtime (and git's
+    view of it) stays put. Returns whether the file was written.
+    """
+    data = text.encode("utf-8")
+    if path.exists() and path.read_bytes() == data:
+        run_metrics.count("files_unchanged")
+        return False
+    atomic_file.write(path, data)
+    run_metrics.record_write(len(data))
+    return True
+
+
+def render_digest_body(digest_data, date_obj):
+    """Render the digest body (date, top story, cards) once for the post, index and email."""
+    ctx = {
+        "date_formatted": date_obj.strftime("%B %d, %Y"),
+        "quiet_day": bool(digest_data.get("quiet_day")),
+        "quiet_message": digest_data.get("message", "Quiet day."),
+        "top_story": digest_data.get("top_story"),
+        "sections": [],
+    }
+    if not ctx["quiet_day"]:
+        ctx.update(
             funding_rounds=digest_data.get("funding_rounds", []),
             product_launches=digest_data.get("product_launches", []),
             stealth_launches=digest_data.get("stealth_launches", []),
             health_tech=digest_data.get("health_tech", []),
-            sections=sections,
+            sections=digest_data.get("sections", []),
         )
+    return JINJA_ENV.get_template("digest_body.html").render(**ctx)
+
+
+def generate_post_html(digest_data, date_obj, digest_html):
+    """Generate the individual post HTML file."""
+    date_iso = date_obj.strftime("%Y-%m-%d")
+    date_formatted = date_obj.strftime("%B %d, %Y")
+    top_story_title = "Quiet news day" if digest_data.get("quiet_day") else digest_data["top_story"]["title"]
+
+    html = JINJA_ENV.get_template("post.html").render(
+        date_iso=date_iso,
+        date_formatted=date_formatted,
+        top_story_title=top_story_title,
+        digest_html=digest_html,
+    )
 
     # Write post file
-    POSTS_DIR.mkdir(parents=True, exist_ok=True)
     post_path = POSTS_DIR / f"{date_iso}.html"
-    post_path.write_text(html, encoding="utf-8")
-    logger.info(f"Generated post: {post_path}")
+    if _write_output(post_path, html):
+        logger.info(f"Generated post: {post_path}")
+    else:
+        logger.info(f"Post unchanged: {post_path}")
+
+    manifest = load_manifest()
+    manifest[date_iso] = top_story_title
+    save_manifest(manifest)
     return date_iso, date_formatted
 
 
-def update_index(digest_data, date_obj):
-    """Regenerate the digest index.html with latest content and archive."""
-    date_iso = date_obj.strftime("%Y-%m-%d")
-    date_formatted = date_obj.strftime("%B %d, %Y")
+# --- Archive manifest ---
+# The index's archive list used to be rebuilt by reading every post and
+# regex-scanning it for its og:description. The manifest keeps that one fact
+# per post so the index build never opens the posts at all.
 
-    # Render the latest digest content for embedding
-    digest_template = Template(INDEX_DIGEST_TEMPLATE)
-    if digest_data.get("quiet_day"):
-        latest_html = digest_template.render(
-            date_formatted=date_formatted,
-            quiet_day=True,
-            quiet_message=digest_data.get("message", "Quiet day."),
-            top_story=None,
-            sections=[],
-        )
+def load_manifest():
+    """{date_iso: top story title}; rebuilt from the posts if it's missing."""
+    if not MANIFEST_PATH.exists():
+        return rebuild_manifest()
+    return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+
+
+def save_manifest(manifest):
+    ordered = dict(sorted(manifest.items(), reverse=True))
+    _write_output(MANIFEST_PATH, json.dumps(ordered, indent=1, ensure_ascii=False) + "\n")
+
+
+def rebuild_manifest():
+    """Backfill the manifest from the post files (one full read per post)."""
+    manifest = {}
+    for post_file in POSTS_DIR.glob("*.html") if POSTS_DIR.exists() else []:
+        try:
+            post_date = datetime.strptime(post_file.stem, "%Y-%m-%d")  # e.g. "2026-02-08"
+        except ValueError:
+            continue
+        title_match = re.search(r'<meta property="og:description" content="([^"]*)"', post_file.read_text(encoding="utf-8"))
+        manifest[post_file.stem] = title_match.group(1) if title_match else post_date.strftime("%B %d, %Y")
+    save_manifest(manifest)
+    logger.info(f"Rebuilt archive manifest from {len(manifest)} posts: {MANIFEST_PATH}")
+    return manifest
+
+
+def _archive_items(manifest):
+    """Manifest -> archive list entries for the templates, newest first."""
+    return [
+        {
+            "date_iso": post_date_str,
+            "date_formatted": datetime.strptime(post_date_str, "%Y-%m-%d").strftime("%B %d, %Y"),
+            "top_story_title": top_title,
+        }
+        for post_date_str, top_title in sorted(manifest.items(), reverse=True)
+    ]
+
+
+def _archive_months(items):
+    """{"YYYY-MM": [items]} in newest-first order."""
+    months = {}
+    for item in items:
+        months.setdefault(item["date_iso"][:7], []).append(item)
+    return months
+
+
+def write_archive_pages(manifest, only_months=None):
+    """Write digest/archive/YYYY-MM.html for each month (or just only_months)."""
+    template = JINJA_ENV.get_template("archive_month.html")
+    for key, items in _archive_months(_archive_items(manifest)).items():
+        if only_months is not None and key not in only_months:
+            continue
+        label = datetime.strptime(key, "%Y-%m").strftime("%B %Y")
+        if _write_output(ARCHIVE_DIR / f"{key}.html", template.render(month_label=label, archive=items)):
+            logger.info(f"Updated archive page: {key}")
+
+
+def update_index(digest_html, date_obj):
+    """Regenerate the digest index.html with latest content and archive."""
+    manifest = load_manifest()
+    items = _archive_items(manifest)
+    months = _archive_months(items)
+    month_links = [
+        {"key": key, "label": datetime.strptime(key, "%Y-%m").strftime("%B %Y"), "count": len(month_items)}
+        for key, month_items in months.items()
+    ]
+    index_html = JINJA_ENV.get_template("index.html").render(
+        latest_html=digest_html,
+        archive=items[:ARCHIVE_PAGE_SIZE],
+        months=month_links if len(items) > ARCHIVE_PAGE_SIZE else [],
+    )
+    if _write_output(INDEX_PATH, index_html):
+        logger.info(f"Updated index: {INDEX_PATH}")
     else:
-        latest_html = digest_template.render(
-            date_formatted=date_formatted,
-            quiet_day=False,
-            quiet_message="",
-            top_story=digest_data["top_story"],
-            funding_rounds=digest_data.get("funding_rounds", []),
-            product_launches=digest_data.get("product_launches", []),
-            stealth_launches=digest_data.get("stealth_launches", []),
-            health_tech=digest_data.get("health_tech", []),
-            sections=digest_data.get("sections", []),
-        )
+        logger.info(f"Index unchanged: {INDEX_PATH}")
 
-    # Build archive list from existing post files
-    archive_items = []
-    archive_template = Template(ARCHIVE_ITEM_TEMPLATE)
-    if POSTS_DIR.exists():
-        for post_file in sorted(POSTS_DIR.glob("*.html"), reverse=True):
-            post_date_str = post_file.stem  # e.g. "2026-02-08"
-            try:
-                post_date = datetime.strptime(post_date_str, "%Y-%m-%d")
-                post_date_fmt = post_date.strftime("%B %d, %Y")
-            except ValueError:
-                continue
+    stale = {date_obj.strftime("%Y-%m")} | {key for key in months if not (ARCHIVE_DIR / f"{key}.html").exists()}
+    write_archive_pages(manifest, only_months=stale)
 
-            # Extract top story title from the post HTML (quick parse)
-            post_content = post_file.read_text(encoding="utf-8")
-            title_match = re.search(r'<meta property="og:description" content="([^"]*)"', post_content)
-            top_title = title_match.group(1) if title_match else post_date_fmt
-
-            archive_items.append(
-                archive_template.render(
-                    date_iso=post_date_str,
-                    date_formatted=post_date_fmt,
-                    top_story_title=top_title,
-                )
-            )
 
-    archive_html = "\n                ".join(archive_items) if archive_items else '<li class="archive-empty">No digests yet. The first one is on its way.</li>'
-
-    # Read the index template and inject content
-    index_html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Daily News – AI, Startups & Health Tech | Joshua Hou</title>
-    <meta name="description" content="A daily curated briefing on what's happening in AI, startups, and personal health tech, powered by an autonomous agent.">
-    <meta property="og:title" content="Daily News – AI, Startups & Health Tech">
-    <meta property="og:description" content="A daily curated briefing on what's happening in AI, startups, and personal health tech.">
-    <meta property="og:type" content="website">
-    <meta property="og:url" content="https://joshhou.com/digest">
-    <link rel="icon" type="image/svg+xml" href="data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 100 100'><text y='.9em' font-size='90'>📡</text></svg>">
-    <link rel="preconnect" href="https://fonts.googleapis.com">
-    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
-    <link href="https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-    <link rel="stylesheet" href="styles.css">
-</head>
-<body>
-    <nav class="nav">
-        <a href="/" class="nav-back">&larr; joshhou.com</a>
-    </nav>
-    <main class="container">
-        <header class="hero">
-            <h1 class="hero-title">Daily News</h1>
-            <p class="hero-subtitle">A curated briefing on AI, startups, and personal health tech, generated every morning by an autonomous agent.</p>
-        </header>
-
-        <section id="latest-digest" class="latest-digest">
-{latest_html}
-        </section>
-
-        <section class="archive-section">
-            <h2 class="archive-heading">Archive</h2>
-            <ul id="archive-list" class="archive-list">
-                {archive_html}
-            </ul>
-        </section>
-    </main>
-    <footer class="footer">
-        <p>&copy; 2026 Joshua Hou. Built with an autonomous agent, GPT-4o, and RSS feeds.</p>
-    </footer>
-    <script src="main.js"></script>
-</body>
-</html>"""
-
-    INDEX_PATH.write_text(index_html, encoding="utf-8")
-    logger.info(f"Updated index: {INDEX_PATH}")
-
-
-def send_resend_email(digest_data, date_obj):
-    """Send the digest to Josh via Resend."""
+def send_resend_email(date_obj, digest_html):
+    """Send the digest to Josh via Resend. Returns True if it was accepted."""
     api_key = os.environ.get("RESEND_API_KEY")
     if not api_key:
         logger.info("RESEND_API_KEY not set, skipping email")
-        return
+        return False
 
     date_formatted = date_obj.strftime("%B %d, %Y")
     subject = f"Daily News — {date_formatted}"
 
-    # Build a simple email-friendly HTML body
-    if digest_data.get("quiet_day"):
-        body = f"<p>{digest_data.get('message', 'Quiet news day.')}</p>"
-    else:
-        top = digest_data["top_story"]
-        body = f'<h2>Top Story: {top["title"]}</h2>\n<p>{top["summary"]}</p>\n'
-        for article in top.get("articles", []):
-            body += f'<p><a href="{article["url"]}">{article["title"]}</a> ({article["source"]})</p>\n'
-        body += "<hr>\n"
-
-        # Bullet list sections
-        for label, key in [("💰 New Funding Rounds", "funding_rounds"), ("🚀 New Product Launches", "product_launches"), ("👀 Out of Stealth", "stealth_launches"), ("❤️ Personal Health Tech", "health_tech")]:
-            items = digest_data.get(key, [])
-            if items:
-                body += f"<h3>{label}</h3>\n<ul>\n"
-                for item in items:
-                    body += f'<li><a href="{item["url"]}">{item["text"]}</a></li>\n'
-                body += "</ul>\n"
-
-        for section in digest_data.get("sections", []):
-            body += f'<h3>{section["title"]}</h3>\n<p>{section["summary"]}</p>\n'
-            for article in section.get("articles", []):
-                body += f'<p><a href="{article["url"]}">{article["title"]}</a> ({article["source"]})</p>\n'
-            body += "\n"
-
-    body += '\n<p><a href="https://joshhou.com/digest">View on the web</a></p>'
+    # Same rendered body as the web page, plus a link back to it
+    body = digest_html + '\n<p><a href="https://joshhou.com/digest">View on the web</a></p>'
+
+    message = {
+        "from": "Daily Digest <onboarding@resend.dev>",
+        "to": ["joshuahou17@gmail.com"],
+        "subject": subject,
+        "html": body,
+    }
+    # Through the shared send path: the pooled session, the same result
+    # mapping as the bulk sends, and Retry-After honoured on a 429.
+    try:
+        ok, detail, _ = email_dispatch.send_one(api_key, message)
+    except email_dispatch.AuthError as e:
+        ok, detail = False, e
+    if ok:
+        logger.info(f"Resend email sent successfully ({detail})")
+        return True
+    logger.warning(f"Failed to send Resend email: {detail}")
+    return False
+
+
+# --- Stage checkpoints ---
+# Each stage's output is saved under .cache/digest/runs/<date>/ so a run that
+# fails after the GPT-4o call can be resumed without re-fetching or paying for
+# curation again.
+
+STAGES = ["fetch", "curate", "render", "email"]
+RUNS_DIR = CACHE_DIR / "runs"
+RUN_RETENTION_DAYS = 14
+
+
+def checkpoint_path(date_obj, stage):
+    return RUNS_DIR / date_obj.strftime("%Y-%m-%d") / f"{stage}.json"
+
+
+def load_checkpoint(date_obj, stage):
+    p = checkpoint_path(date_obj, stage)
+    return json.loads(p.read_text(encoding="utf-8")) if p.exists() else None
+
+
+def save_checkpoint(date_obj, stage, data):
+    atomic_file.write(checkpoint_path(date_obj, stage), json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def prune_runs(date_obj):
+    """Drop run directories older than RUN_RETENTION_DAYS."""
+    cutoff = (date_obj - timedelta(days=RUN_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    for d in RUNS_DIR.glob("*") if RUNS_DIR.exists() else []:
+        if d.is_dir() and d.name < cutoff:
+            for f in d.iterdir():
+                f.unlink()
+            d.rmdir()
+
+
+# --- No-op detection ---
 
+def input_items(articles):
+    """A short hash per article (URL + summary) identifying the run's input."""
+    return sorted({
+        hashlib.sha256(f"{a.get('canonical_url') or a['url']}\0{a.get('summary', '')}".encode("utf-8")).hexdigest()[:16]
+        for a in articles
+    })
+
+
+def load_last_input():
     try:
-        resp = requests.post(
-            "https://api.resend.com/emails",
-            headers={"Authorization": f"Bearer {api_key}"},
-            json={
-                "from": "Daily Digest <onboarding@resend.dev>",
-                "to": ["joshuahou17@gmail.com"],
-                "subject": subject,
-                "html": body,
-            },
-            timeout=30,
-        )
-        if resp.status_code in (200, 201):
-            logger.info("Resend email sent successfully")
-        else:
-            logger.warning(f"Resend API returned {resp.status_code}: {resp.text}")
-    except Exception as e:
-        logger.warning(f"Failed to send Resend email: {e}")
+        return json.loads(LAST_INPUT_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_last_input(date_obj, items):
+    record = {
+        "date": date_obj.strftime("%Y-%m-%d"),
+        "fingerprint": hashlib.sha256("\n".join(items).encode("ascii")).hexdigest(),
+        "items": items,
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+    }
+    atomic_file.write(LAST_INPUT_PATH, json.dumps(record, indent=1))
+
+
+def is_noop(items):
+    """True if nothing arrived since the last successful digest: every input
+    item was already part of it, and its post is still in the checkout (a
+    re-run on a fresh checkout after a failed push has to write it again)."""
+    last = load_last_input()
+    if not last or not (POSTS_DIR / f"{last['date']}.html").exists():
+        return False
+    return set(items) <= set(last["items"])
+
+
+def handle_noop(last):
+    logger.info(f"No new articles since the {last['date']} digest; nothing to do")
+    for stage in STAGES[1:]:
+        run_metrics.skip_stage(stage, "no new input")
+    if NOOP_ACTION == "touch":
+        last["checked_at"] = datetime.now(timezone.utc).isoformat()
+        atomic_file.write(LAST_INPUT_PATH, json.dumps(last, indent=1))
+        if INDEX_PATH.exists():
+            os.utime(INDEX_PATH)
 
 
 def main():
+    p = argparse.ArgumentParser(description="Daily AI/Startup Digest Generator")
+    p.add_argument("--no-cache", action="store_true", help="ignore cached LLM responses and call the model again")
+    p.add_argument("--resume", action="store_true",
+                   help="skip any stage whose output for today is already saved")
+    p.add_argument("--from-stage", choices=STAGES, default=None,
+                   help="re-run from this stage on, reusing saved output of the stages before it")
+    p.add_argument("--metrics-file", default=None,
+                   help="where to write the run's JSON metrics (default: .cache/digest/runs/<date>/metrics.json)")
+    p.add_argument("--prometheus-file", default=None,
+                   help="also write the metrics as a Prometheus textfile (e.g. for node_exporter)")
+    p.add_argument("--rebuild-manifest", action="store_true",
+                   help="backfill digest/archive.json from the existing posts, rewrite every archive month page, and exit")
+    p.add_argument("--curation-mode", choices=["single", "map-reduce"], default=CURATION_MODE,
+                   help=f"curate in one GPT-4o call or in parallel shards plus a final call (default: {CURATION_MODE})")
+    p.add_argument("--enrich", action=argparse.BooleanOptionalAction, default=ENRICH_ARTICLES,
+                   help="add an excerpt of each story's article page to the prompt")
+    p.add_argument("--force", action="store_true",
+                   help="run every stage even if nothing new arrived since the last digest")
+    p.add_argument("--feed-report", action="store_true",
+                   help="print each feed's health (latency, failure streak, yield, breaker state) and exit")
+    args = p.parse_args()
+
+    if args.rebuild_manifest:
+        write_archive_pages(rebuild_manifest())
+        return
+    if args.feed_report:
+        print(feed_health.report(feed_health.load(FEED_HEALTH_PATH), datetime.now(timezone.utc)))
+        return
+
     today = datetime.now(timezone.utc)
     logger.info(f"Generating digest for {today.strftime('%Y-%m-%d')}")
+    prune_runs(today)
+    try:
+        run_pipeline(args, today)
+    finally:
+        # Written even when a stage fails — that's when the numbers matter most
+        run_metrics.write_json(args.metrics_file or checkpoint_path(today, "metrics"))
+        if args.prometheus_file:
+            run_metrics.write_prometheus(args.prometheus_file)
+
+
+def run_pipeline(args, today):
+    def resumed(stage):
+        """Saved output for stage if this run should reuse it, else None."""
+        if args.from_stage and STAGES.index(stage) >= STAGES.index(args.from_stage):
+            return None
+        if not (args.resume or args.from_stage):
+            return None
+        data = load_checkpoint(today, stage)
+        if data is not None:
+            logger.info(f"Resuming: {stage} stage already done, using {checkpoint_path(today, stage)}")
+            run_metrics.skip_stage(stage, "resumed")
+        return data
 
     # Step 1: Fetch articles
-    articles = fetch_articles()
+    articles = resumed("fetch")
+    if articles is None:
+        with run_metrics.stage("fetch"):
+            articles = fetch_articles()
+            articles = drop_seen_articles(articles, today)
+        save_checkpoint(today, "fetch", articles)
+
+    # Nothing new since the last digest: stop before paying for GPT-4o or
+    # rewriting pages. An explicit --from-stage or --no-cache means "redo it",
+    # and --resume already skips whatever today's run has finished.
+    items = input_items(articles)
+    if not (args.force or args.from_stage or args.no_cache or args.resume) and is_noop(items):
+        handle_noop(load_last_input())
+        return
 
     # Step 2: Curate with GPT-4o
-    try:
-        digest_data = curate_with_gpt(articles)
-    except Exception as e:
-        logger.error(f"GPT-4o curation failed: {e}")
-        sys.exit(1)
-
-    # Step 3: Generate post HTML
-    generate_post_html(digest_data, today)
-
-    # Step 4: Update index page
-    update_index(digest_data, today)
+    digest_data = resumed("curate")
+    if digest_data is None:
+        try:
+            with run_metrics.stage("curate"):
+                stories = prefilter_stories(group_stories(articles))
+                if args.enrich:
+                    enrich_stories(stories)
+                digest_data = curate_with_gpt(stories, use_cache=not args.no_cache, mode=args.curation_mode)
+        except Exception as e:
+            logger.error(f"GPT-4o curation failed: {e}")
+            sys.exit(1)
+        save_checkpoint(today, "curate", digest_data)
+
+    # Step 3: Generate post HTML (the digest body is rendered once and shared)
+    digest_html = render_digest_body(digest_data, today)
+    # The pages live in the checkout, not the cache: a re-run after a failed push
+    # starts from a clean checkout and has to write them again.
+    post_exists = (POSTS_DIR / f"{today.strftime('%Y-%m-%d')}.html").exists()
+    if not post_exists or resumed("render") is None:
+        with run_metrics.stage("render"):
+            generate_post_html(digest_data, today, digest_html)
+
+            # Step 4: Update index page
+            update_index(digest_html, today)
+        save_checkpoint(today, "render", {"post": f"{today.strftime('%Y-%m-%d')}.html"})
+        save_last_input(today, items)
+        record_published_articles(articles, today)
 
     # Step 5: Send email (non-blocking — site update succeeds even if this fails)
-    send_resend_email(digest_data, today)
+    if resumed("email") is None:
+        with run_metrics.stage("email"):
+            sent = send_resend_email(today, digest_html)
+        if sent:
+            save_checkpoint(today, "email", {"sent_at": datetime.now(timezone.utc).isoformat()})
 
     logger.info("Digest generation complete")
 
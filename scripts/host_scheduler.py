@@ -0,0 +1,99 @@
+"""
+Per-host politeness scheduler for the feed fetcher.
+
+A few publishers host many of our feeds (techcrunch.com, arstechnica.com,
+news.google.com), so a plain thread pool over a long feed list ends up
+hammering one site with a burst of parallel requests. Here a fixed set of
+workers pulls jobs in priority order, but a worker only starts a job when
+its host has a free slot (at most `per_host` requests in flight) and the
+host's minimum interval since the last request start has passed. Otherwise
+it moves on to the next job whose host is ready, so one busy host never
+stalls the rest of the list.
+
+    results, in_flight, unstarted = run(jobs, fetch, workers=16, limits=lambda host: (4, 0.25), deadline=45)
+
+jobs is a list of (key, url) pairs, highest priority first. results maps each
+finished key to (True, return value) or (False, exception). At the deadline,
+jobs still in flight are left to finish or time out on their own and jobs
+not yet started are dropped; both come back as lists of keys.
+"""
+
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+def run(jobs, fn, workers, limits, deadline):
+    """Call fn(url) for every job under per-host limits; see module docstring.
+
+    limits(host) returns (max_in_flight, min_interval_seconds) for a host.
+    """
+    started = time.monotonic()
+    cond = threading.Condition()
+    pending = list(jobs)
+    in_flight = Counter()
+    next_start = {}
+    results = {}
+    state = {"stopped": False}
+
+    def take():
+        with cond:
+            while True:
+                if state["stopped"] or not pending:
+                    return None
+                now = time.monotonic()
+                wake_in = None
+                for i, (key, url) in enumerate(pending):
+                    host = host_of(url)
+                    cap, interval = limits(host)
+                    if in_flight[host] >= cap:
+                        continue
+                    ready_at = next_start.get(host, 0.0)
+                    if ready_at <= now:
+                        del pending[i]
+                        in_flight[host] += 1
+                        next_start[host] = now + interval
+                        return key, url, host
+                    wake_in = ready_at - now if wake_in is None else min(wake_in, ready_at - now)
+                # Nothing startable: sleep until an interval elapses or a slot frees up
+                cond.wait(timeout=wake_in)
+
+    def worker():
+        while True:
+            job = take()
+            if job is None:
+                return
+            key, url, host = job
+            try:
+                outcome = (True, fn(url))
+            except Exception as e:
+                outcome = (False, e)
+            with cond:
+                results[key] = outcome
+                in_flight[host] -= 1
+                cond.notify_all()
+
+    threads = [
+        threading.Thread(target=worker, name=f"feed-{i}", daemon=True)
+        for i in range(min(workers, len(jobs)))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=max(0.0, deadline - (time.monotonic() - started)))
+
+    with cond:
+        state["stopped"] = True
+        cond.notify_all()
+        finished = dict(results)
+        unstarted = {key for key, _ in pending}
+    return (
+        finished,
+        [key for key, _ in jobs if key not in finished and key not in unstarted],
+        [key for key, _ in jobs if key in unstarted],
+    )
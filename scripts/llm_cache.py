@@ -0,0 +1,74 @@
+"""
+Content-addressed cache for LLM responses.
+
+Re-running the digest workflow (after a failed push, or to pick up a template
+fix) would otherwise pay for a fresh GPT-4o call on exactly the same input.
+Responses are stored on disk under a SHA-256 of everything that determines
+them — model, messages and request parameters — so an identical request is
+answered from disk and anything that changes the prompt misses naturally.
+
+Entries expire after a TTL, and the oldest are evicted once the cache holds
+more than max_entries.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+import atomic_file
+
+logger = logging.getLogger(__name__)
+
+_evict_lock = threading.Lock()  # map-reduce shards store responses concurrently
+
+
+def request_key(model, messages, **params):
+    blob = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def get(cache_dir, key, ttl_seconds):
+    """Cached response content for key, or None if missing or expired."""
+    p = Path(cache_dir) / f"{key}.json"
+    if not p.exists():
+        return None
+    try:
+        entry = json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("created_at", 0) > ttl_seconds:
+        return None
+    return entry.get("content")
+
+
+def put(cache_dir, key, content, ttl_seconds, max_entries, **meta):
+    cache_dir = Path(cache_dir)
+    try:
+        entry = {"created_at": time.time(), "content": content, **meta}
+        atomic_file.write(cache_dir / f"{key}.json", json.dumps(entry, ensure_ascii=False))
+    except OSError as e:
+        logger.warning(f"Could not write LLM cache entry: {e}")
+        return
+    try:
+        evict(cache_dir, ttl_seconds, max_entries)
+    except OSError as e:
+        logger.warning(f"Could not evict LLM cache entries: {e}")
+
+
+def evict(cache_dir, ttl_seconds, max_entries):
+    """Delete expired entries, then the oldest ones beyond max_entries."""
+    now = time.time()
+    with _evict_lock:
+        files = []
+        for p in Path(cache_dir).glob("*.json"):
+            try:
+                files.append((p.stat().st_mtime, p))
+            except FileNotFoundError:
+                continue
+        files.sort(key=lambda f: f[0], reverse=True)
+        for i, (mtime, p) in enumerate(files):
+            if i >= max_entries or now - mtime > ttl_seconds:
+                p.unlink(missing_ok=True)
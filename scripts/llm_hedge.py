@@ -0,0 +1,153 @@
+"""
+Hedged, deadline-bounded LLM requests.
+
+One slow or failing OpenAI call used to cost the day's digest. run() instead
+races up to two paths against a hard deadline:
+
+    primary   the request as asked for, started immediately
+    hedge     a second request, started once the primary has been
+              outstanding for hedge_after seconds (or straight away if the
+              primary fails), optionally to another model or provider
+
+The first answer from either path wins; the loser is abandoned. Requests run
+on daemon threads, so an abandoned one can't keep the process alive after the
+digest is done (a ThreadPoolExecutor's workers are joined at exit). A path whose
+request fails is retried with full-jitter exponential back-off while there
+is time left. The outcome (which path won, on which attempt, how long it
+took, what the hedge threshold was) is returned so the caller can record it.
+
+hedge_after comes from threshold(): a percentile of recent latencies for
+the model, measured from when the request began (so a hedge win counts the
+time spent waiting for the primary too), kept in a small JSON history file, so the hedge
+fires only for requests slower than the usual tail.
+"""
+
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+
+import openai
+
+import atomic_file
+
+logger = logging.getLogger(__name__)
+
+HISTORY_KEEP = 50  # samples kept per model
+MIN_SAMPLES = 5  # below this, use the default threshold
+
+
+# --- Latency history ---
+
+def load_history(path):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_history(path, history):
+    p = Path(path)
+    try:
+        atomic_file.write(p, json.dumps(history, indent=1))
+    except OSError as e:
+        logger.warning(f"Could not write LLM latency history: {e}")
+
+
+def record(history, model, outcome):
+    samples = history.setdefault(model, [])
+    samples.append(outcome)
+    del samples[:-HISTORY_KEEP]
+
+
+def threshold(history, model, percentile, floor, default):
+    """Seconds to wait before hedging a request to model."""
+    samples = sorted(s["seconds"] for s in history.get(model, []))
+    if len(samples) < MIN_SAMPLES:
+        return default
+    idx = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+    return max(floor, samples[idx])
+
+
+# --- Racing ---
+
+def retryable(error):
+    """True for failures another attempt may get past: timeouts, dropped
+    connections, 429s and 5xx. A refused key or a bad request fails alike
+    on every attempt and every path."""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, TimeoutError, ConnectionError))
+
+
+def run(call, primary, hedge, deadline, hedge_after, max_retries, retry_base, rng=random):
+    """Return (result, outcome) for the first of call(primary) / call(hedge) to
+    succeed, or raise the last error (TimeoutError if nothing answered
+    in time, or at once if it isn't retryable()). call(target, timeout)
+    must not retry on its own."""
+    started = time.monotonic()
+    targets = {"primary": primary, "hedge": hedge}
+    finished = queue.Queue()  # (path, attempt, started_at, ok, result or error)
+    running = 0
+    start_at = {"primary": 0.0, "hedge": hedge_after}  # path -> elapsed time to (re)start it
+    attempts = {"primary": 0, "hedge": 0}
+    last_error = None
+
+    def elapsed():
+        return time.monotonic() - started
+
+    def attempt_thread(path, attempt, began, timeout):
+        try:
+            finished.put((path, attempt, began, True, call(targets[path], timeout)))
+        except Exception as e:
+            finished.put((path, attempt, began, False, e))
+
+    while True:
+        now = elapsed()
+        if now >= deadline:
+            raise TimeoutError(f"no LLM response within {deadline:.0f}s") from last_error
+        for path, at in list(start_at.items()):
+            if at <= now:
+                del start_at[path]
+                attempts[path] += 1
+                if path == "hedge" or attempts[path] > 1:
+                    logger.info(f"LLM {path} request #{attempts[path]} ({targets[path]['model']}) at {now:.1f}s")
+                threading.Thread(
+                    target=attempt_thread, args=(path, attempts[path], now, deadline - now),
+                    name=f"llm-{path}-{attempts[path]}", daemon=True,
+                ).start()
+                running += 1
+        if not running and not start_at:
+            raise last_error or RuntimeError("no LLM request could be made")
+
+        wake = deadline - now
+        if start_at:
+            wake = min(wake, min(start_at.values()) - now)
+        try:
+            path, attempt, began, ok, value = finished.get(timeout=max(0.0, wake))
+        except queue.Empty:
+            continue
+        running -= 1
+        if not ok:
+            last_error = value
+            logger.warning(f"LLM {path} request #{attempt} failed after {elapsed() - began:.1f}s: {value}")
+            if not retryable(value):
+                raise value
+            if attempts[path] <= max_retries:
+                start_at[path] = elapsed() + rng.uniform(0, retry_base * 2 ** (attempt - 1))
+            if path == "primary" and attempts["hedge"] == 0:
+                start_at["hedge"] = min(start_at.get("hedge", 0.0), elapsed())  # don't wait out the threshold
+            continue
+        # The losing request, if any, finishes (or times out) unobserved on its daemon thread
+        return value, {
+            "winner": path,
+            "model": targets[path]["model"],
+            "attempt": attempt,
+            "seconds": round(elapsed(), 3),  # from when the request began, as the caller waited
+            "attempt_seconds": round(elapsed() - began, 3),
+            "hedge_after": round(hedge_after, 3),
+            "hedged": attempts["hedge"] > 0,
+        }
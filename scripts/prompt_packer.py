@@ -0,0 +1,135 @@
+"""
+Token-budgeted prompt packing for digest curation.
+
+The curation prompt is every story we collected, so without a ceiling its size
+(and GPT-4o's latency and cost) grows with the feed list. The packer measures
+the prompt in real tokens, trims each summary to a token cap, and — when the
+batch is still over budget — ranks stories and shortens, then drops, the
+lowest-ranked ones until it fits. Kept stories stay in their original order.
+
+Token counts come from tiktoken when it's installed; otherwise a ~4
+characters-per-token estimate is used, which is close enough to keep the
+budget meaningful.
+"""
+
+import logging
+import re
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+ENCODING_MODEL = "gpt-4o"
+CHARS_PER_TOKEN = 4  # fallback estimate when tiktoken is unavailable
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(ENCODING_MODEL)
+        except Exception as e:  # not installed, or the BPE file couldn't be downloaded
+            logger.warning(f"tiktoken unavailable ({e}); estimating tokens at {CHARS_PER_TOKEN} chars each")
+    return _encoding
+
+
+def tokenizer_name():
+    return "tiktoken" if _get_encoding() else "estimate"
+
+
+def count_tokens(text):
+    enc = _get_encoding()
+    if enc:
+        return len(enc.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_tokens(text, max_tokens):
+    """Cut text to at most max_tokens tokens, marking the cut with an ellipsis."""
+    enc = _get_encoding()
+    if enc:
+        tokens = enc.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return enc.decode(tokens[:max_tokens]).rstrip() + "…"
+    limit = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+# --- Ranking ---
+
+def story_score(story, source_priority, keywords, window_hours, now=None):
+    """Higher is more worth keeping: source weight, recency within the
+    window_hours fetch window, priority-topic keyword hits, and how many
+    outlets covered the story."""
+    now = now or datetime.now(timezone.utc)
+    sources = story.get("sources") or [story]
+    score = max(source_priority.get(s["source"], 1.0) for s in sources)
+    if story.get("published"):
+        age_hours = (now - datetime.fromisoformat(story["published"])).total_seconds() / 3600
+        score += max(0.0, 1.0 - age_hours / window_hours)
+    text = f"{story.get('title', '')} {story.get('summary', '')}".lower()
+    score += 0.5 * sum(1 for kw in keywords if re.search(rf"\b{re.escape(kw.lower())}\b", text))
+    score += 0.5 * (len(sources) - 1)
+    return score
+
+
+# --- Packing ---
+
+def pack(stories, format_entry, budget, overhead, summary_max, summary_min, scores):
+    """Fit stories into budget tokens.
+
+    format_entry(i, story) renders one numbered prompt entry; overhead is the
+    token cost of everything around the entries (system prompt, template).
+    scores[i] ranks stories[i]. Returns (packed_stories, articles_text, report).
+    """
+    entries = []
+    for story, score in zip(stories, scores):
+        s = dict(story)
+        s["summary"] = truncate_tokens(s.get("summary", ""), summary_max)
+        entries.append({"story": s, "score": score, "shortened": False, "dropped": False})
+
+    def cost(e):
+        # numbering doesn't change the count meaningfully; render with a placeholder index
+        return count_tokens(format_entry(0, e["story"]))
+
+    for e in entries:
+        e["tokens"] = cost(e)
+    total = overhead + sum(e["tokens"] for e in entries)
+    lowest_first = sorted(range(len(entries)), key=lambda i: (entries[i]["score"], -i))
+
+    # First shorten the weakest stories (summary cut, full-text excerpt
+    # removed), then drop whole stories.
+    for i in lowest_first:
+        if total <= budget:
+            break
+        e = entries[i]
+        short = truncate_tokens(e["story"]["summary"], summary_min)
+        if short != e["story"]["summary"] or e["story"].get("excerpt"):
+            e["story"]["summary"] = short
+            e["story"].pop("excerpt", None)
+            e["shortened"] = True
+            before, e["tokens"] = e["tokens"], cost(e)
+            total -= before - e["tokens"]
+    for i in lowest_first:
+        if total <= budget:
+            break
+        entries[i]["dropped"] = True
+        total -= entries[i]["tokens"]
+
+    packed = [e["story"] for e in entries if not e["dropped"]]
+    articles_text = "".join(format_entry(i, s) for i, s in enumerate(packed, 1))
+    report = {
+        "tokenizer": tokenizer_name(),
+        "budget": budget,
+        "prompt_tokens": overhead + count_tokens(articles_text),
+        "stories_in": len(stories),
+        "stories_packed": len(packed),
+        "shortened": [e["story"]["title"] for e in entries if e["shortened"] and not e["dropped"]],
+        "dropped": [e["story"]["title"] for e in entries if e["dropped"]],
+    }
+    return packed, articles_text, report
@@ -0,0 +1,178 @@
+"""
+Per-run metrics for the digest pipeline.
+
+A module-level recorder the pipeline reports into as it goes — stage
+durations and peak RSS, per-feed bytes/entries/latency, LLM token usage,
+bytes written — and that is dumped once at the end of the run as JSON (and
+optionally a Prometheus textfile for node_exporter). Recording is
+thread-safe because feeds report from fetch worker threads.
+
+    with run_metrics.stage("fetch"):
+        ...
+    run_metrics.record_feed("TechCrunch AI", bytes=48213, entries=20, seconds=0.41)
+    run_metrics.write_json(path)
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import atomic_file
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+        _metrics.update(
+            started_at=datetime.now(timezone.utc).isoformat(),
+            stages={},
+            feeds={},
+            llm={"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0},
+            llm_requests=[],
+            bytes_written=0,
+            files_written=0,
+            counters={},
+        )
+
+
+reset()
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage; records duration, outcome and peak RSS so far."""
+    started = time.monotonic()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        with _lock:
+            _metrics["stages"][name] = {
+                "seconds": round(time.monotonic() - started, 3),
+                "status": status,
+                "peak_rss_bytes": peak_rss_bytes(),
+            }
+
+
+def skip_stage(name, reason):
+    with _lock:
+        _metrics["stages"][name] = {"seconds": 0.0, "status": f"skipped: {reason}", "peak_rss_bytes": peak_rss_bytes()}
+
+
+def record_feed(name, **fields):
+    """Merge fields (bytes, entries, seconds, status, fresh, ...) into a feed's record."""
+    with _lock:
+        _metrics["feeds"].setdefault(name, {}).update(fields)
+
+
+def record_llm(usage=None, seconds=0.0, cache_hit=False):
+    """Count one LLM request; usage is the OpenAI response's usage object (or None)."""
+    with _lock:
+        llm = _metrics["llm"]
+        if cache_hit:
+            llm["cache_hits"] += 1
+            return
+        llm["calls"] += 1
+        llm["seconds"] = round(llm["seconds"] + seconds, 3)
+        if usage is not None:
+            llm["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            llm["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+def record_llm_outcome(outcome):
+    """Keep how one LLM request was answered (winning path, attempt, latency,
+    hedge threshold) and count wins per path."""
+    with _lock:
+        _metrics["llm_requests"].append(dict(outcome))
+        key = f"llm_{outcome['winner']}_wins"
+        _metrics["counters"][key] = _metrics["counters"].get(key, 0) + 1
+
+
+def record_write(nbytes):
+    with _lock:
+        _metrics["bytes_written"] += nbytes
+        _metrics["files_written"] += 1
+
+
+def count(name, value=1):
+    """Bump a free-form counter (articles_fetched, stories_packed, ...)."""
+    with _lock:
+        _metrics["counters"][name] = _metrics["counters"].get(name, 0) + value
+
+
+def snapshot():
+    with _lock:
+        data = json.loads(json.dumps(_metrics))
+    data["finished_at"] = datetime.now(timezone.utc).isoformat()
+    data["peak_rss_bytes"] = peak_rss_bytes()
+    data["total_seconds"] = round(sum(s["seconds"] for s in data["stages"].values()), 3)
+    return data
+
+
+def write_json(path):
+    atomic_file.write(path, json.dumps(snapshot(), indent=2, ensure_ascii=False))
+    logger.info(f"Wrote run metrics: {path}")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def write_prometheus(path, prefix="digest"):
+    """Write the run as a Prometheus textfile (node_exporter textfile collector format)."""
+    data = snapshot()
+    lines = []
+    described = set()
+
+    def gauge(name, value, labels=None, help_text=None):
+        if value is None:
+            return
+        metric = f"{prefix}_{name}"
+        if help_text and metric not in described:
+            described.add(metric)
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+        label_str = "{" + ",".join(f'{k}="{_label(v)}"' for k, v in labels.items()) + "}" if labels else ""
+        lines.append(f"{metric}{label_str} {value}")
+
+    for name, s in data["stages"].items():
+        gauge("stage_duration_seconds", s["seconds"], {"stage": name}, "Wall time per pipeline stage")
+    for field in ("bytes", "entries", "fresh", "seconds"):  # one metric family at a time, as the format requires
+        for feed, f in data["feeds"].items():
+            if isinstance(f.get(field), (int, float)):
+                gauge(f"feed_{field}", f[field], {"feed": feed}, f"Per-feed {field}")
+    for field, value in data["llm"].items():
+        gauge(f"llm_{field}", value, help_text=f"LLM {field.replace('_', ' ')}")
+    for name, value in data["counters"].items():
+        gauge(name, value, help_text=name.replace("_", " "))
+    gauge("bytes_written", data["bytes_written"], help_text="Bytes written to output files")
+    gauge("peak_rss_bytes", data["peak_rss_bytes"], help_text="Peak resident set size")
+    gauge("run_total_seconds", data["total_seconds"], help_text="Sum of stage durations")
+    gauge("run_finished_timestamp_seconds", int(time.time()), help_text="When the run finished")
+
+    atomic_file.write(path, "\n".join(lines) + "\n")  # node_exporter must never see a half-written file
+    logger.info(f"Wrote Prometheus metrics: {path}")
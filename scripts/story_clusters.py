@@ -0,0 +1,177 @@
+"""
+Near-duplicate story clustering for the daily digest.
+
+The same launch or funding round usually arrives several times — TechCrunch,
+The Verge, Hacker News and Google News each with their own headline. Sending
+every copy to GPT-4o costs prompt tokens for no new information, so articles
+are grouped into stories first and each story goes into the prompt once, with
+all of its source URLs attached.
+
+Similarity is Jaccard over word shingles of title + summary, estimated with
+MinHash and bucketed with LSH so only likely pairs are compared. Everything
+is seeded and order-preserving, so the same input always clusters the same way.
+
+Headlines share a shape far more often than a subject ("X raises $N to ...",
+"Y launches new ... model"), so a similar pair is merged only if its titles
+also agree on who and how much: when both name something (a capitalised word
+the batch never uses in lower case) they must share a name, when both quote a
+dollar amount they must share one, and otherwise they must share at least
+one title word that isn't boilerplate.
+"""
+
+import random
+import re
+import zlib
+from collections import Counter, defaultdict
+
+NUM_PERM = 64
+BANDS = 32  # 32 bands x 2 rows: pairs around 0.3 similarity almost always become candidates
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is",
+    "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "will", "with", "new",
+    "says", "after", "over", "into", "about", "how", "why", "what", "s",
+}
+SUMMARY_WORDS = 60  # summaries vary wildly in length; only their lead is comparable
+COMMON_TOKEN_RATIO = 0.2  # tokens in more than this share of articles are boilerplate ("comments", "points")
+
+
+_TITLE_WORD = re.compile(r"[A-Za-z][\w'-]*")
+_AMOUNT = re.compile(r"\$\s?(\d+(?:\.\d+)?)")
+
+
+def _title_key(article, lower_vocab):
+    """(names, dollar amounts, title words) used to vet a similar pair."""
+    title = article.get("title", "")
+    words = _TITLE_WORD.findall(title)
+    names = {w.lower() for w in words if w != w.lower() and w.lower() not in lower_vocab}
+    amounts = set(_AMOUNT.findall(title))
+    title_words = {w.lower() for w in words} - STOPWORDS
+    return names, amounts, title_words
+
+
+def _same_subject(a, b, common):
+    names_a, amounts_a, words_a = a
+    names_b, amounts_b, words_b = b
+    if amounts_a and amounts_b and not amounts_a & amounts_b:
+        return False
+    if names_a and names_b:
+        return bool(names_a & names_b)
+    return bool((words_a & words_b) - common)
+
+
+def _tokens(article):
+    text = f"{article.get('title', '')} {' '.join(article.get('summary', '').split()[:SUMMARY_WORDS])}"
+    words = re.findall(r"[a-z0-9$]+", text.lower())
+    return [w for w in words if w not in STOPWORDS]
+
+
+def _shingles(tokens, common):
+    """Unigrams plus bigrams, minus batch-wide boilerplate tokens."""
+    words = [w for w in tokens if w not in common]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def _signature(shingles):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def _similarity(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def cluster_articles(articles, threshold):
+    """Group near-duplicate articles; returns a list of clusters (lists of articles).
+
+    Clusters are ordered by their first member's position in the input, and
+    members keep their input order.
+    """
+    token_lists = [_tokens(a) for a in articles]
+    df = Counter(t for tokens in token_lists for t in set(tokens))
+    limit = max(2, int(len(articles) * COMMON_TOKEN_RATIO))
+    common = {t for t, n in df.items() if n > limit}
+    signatures = [_signature(_shingles(tokens, common)) for tokens in token_lists]
+    # Words the batch writes in lower case somewhere are ordinary words, even
+    # when a Title Case headline capitalises them
+    lower_vocab = {
+        w for a in articles for w in _TITLE_WORD.findall(f"{a.get('title', '')} {a.get('summary', '')}")
+        if w == w.lower()
+    }
+    keys = [_title_key(a, lower_vocab) for a in articles]
+
+    parent = list(range(len(articles)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = defaultdict(list)
+    for i, sig in enumerate(signatures):
+        if sig is None:
+            continue
+        for band in range(BANDS):
+            buckets[(band, sig[band * ROWS:(band + 1) * ROWS])].append(i)
+
+    checked = set()
+    for members in buckets.values():
+        for pos, i in enumerate(members):
+            for j in members[pos + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if _similarity(signatures[i], signatures[j]) >= threshold and _same_subject(keys[i], keys[j], common):
+                    ri, rj = find(i), find(j)
+                    if ri != rj:
+                        parent[max(ri, rj)] = min(ri, rj)
+
+    groups = defaultdict(list)
+    for i in range(len(articles)):
+        groups[find(i)].append(articles[i])
+    return [groups[root] for root in sorted(groups)]
+
+
+def merge_cluster(cluster):
+    """One prompt entry for a cluster: the member with the fullest summary,
+    plus a "sources" list (title/url/source) covering every member."""
+    lead = max(cluster, key=lambda a: len(a.get("summary", "")))
+    story = dict(lead)
+    story["sources"] = [{"title": a["title"], "url": a["url"], "source": a["source"]} for a in cluster]
+    return story
+
+
+def attach_cluster_sources(digest_data, stories):
+    """Add the rest of a story's sources wherever the model cited one of them.
+
+    The prompt lists every URL of a clustered story, but the model tends to
+    cite only the first; this fills in the others so the page credits every
+    outlet that covered it.
+    """
+    by_url = {}
+    for story in stories:
+        if len(story.get("sources", [])) > 1:
+            for s in story["sources"]:
+                by_url[s["url"]] = story["sources"]
+
+    blocks = [digest_data.get("top_story") or {}] + list(digest_data.get("sections", []))
+    for block in blocks:
+        cited = block.get("articles") or []
+        urls = {a.get("url") for a in cited}
+        expanded = []
+        for a in cited:
+            expanded.append(a)
+            for s in by_url.get(a.get("url"), []):
+                if s["url"] not in urls:
+                    urls.add(s["url"])
+                    expanded.append(dict(s))
+        if cited:
+            block["articles"] = expanded
+    return digest_data
@@ -0,0 +1,58 @@
+import math
+import random
+
+from config import DEPRIORITIZE_PATTERNS, PRIORITY_KEYWORDS, SOURCE_PRIORITY, TRACKED_COMPANIES
+from relevance import prefilter, score_stories
+
+PRIORITY_STORIES = [
+    ("Whoop raises $100M Series B led by Sequoia", "TechCrunch Startups"),
+    ("OpenAI launches a new reasoning model", "TechCrunch AI"),
+    ("Anthropic acquires developer tools startup", "Crunchbase News"),
+]
+
+
+def day_of_stories():
+    """The priority stories amid 40 off-topic Hacker News posts."""
+    titles = [(f"Thoughts on topic {i}", "Hacker News") for i in range(40)]
+    titles[20:20] = PRIORITY_STORIES
+    return [{"title": t, "summary": f"Notes and discussion about {t.lower()}.", "source": s} for t, s in titles]
+
+
+def score(stories):
+    return score_stories(stories, PRIORITY_KEYWORDS + TRACKED_COMPANIES, SOURCE_PRIORITY, DEPRIORITIZE_PATTERNS)
+
+
+def test_scoring_is_deterministic():
+    stories = day_of_stories()
+    scores = score(stories)
+    assert score(stories) == scores
+    assert prefilter(stories, scores, 0.5, 5) == prefilter(stories, score(stories), 0.5, 5)
+
+    shuffled = stories[:]
+    random.Random(7).shuffle(shuffled)
+    by_title = dict(zip((s["title"] for s in stories), scores))
+    assert dict(zip((s["title"] for s in shuffled), score(shuffled))) == by_title
+
+
+def test_high_priority_stories_always_pass():
+    stories = day_of_stories()
+    kept, _ = prefilter(stories, score(stories), keep_ratio=0.05, min_keep=len(PRIORITY_STORIES))
+    assert [s["title"] for s in kept] == [t for t, _ in PRIORITY_STORIES]
+
+
+def test_top_k_cutoff():
+    stories = day_of_stories()
+    scores = score(stories)
+    kept, dropped = prefilter(stories, scores, keep_ratio=0.25, min_keep=5)
+
+    assert len(kept) == math.ceil(len(stories) * 0.25)
+    assert len(kept) + len(dropped) == len(stories)
+    assert [s for s in stories if s in kept] == kept  # original order
+    lowest_kept = min(scores[stories.index(s)] for s in kept)
+    assert all(s <= lowest_kept for s, _ in dropped)
+    assert [s for s, _ in dropped] == sorted(s for s, _ in dropped)
+
+    kept, _ = prefilter(stories, scores, keep_ratio=0.01, min_keep=5)
+    assert len(kept) == 5
+    kept, dropped = prefilter(stories[:3], scores[:3], keep_ratio=0.25, min_keep=5)
+    assert len(kept) == 3 and dropped == []
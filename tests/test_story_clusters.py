@@ -0,0 +1,58 @@
+from config import CLUSTER_SIMILARITY_THRESHOLD
+from story_clusters import cluster_articles
+
+FILLER_TITLES = [
+    "Senate passes chip export bill", "Apple delays smart home hub", "Stripe acquires stablecoin startup Bridge",
+    "Tesla recalls Cybertruck over trim panel", "Microsoft cuts gaming division jobs", "Nvidia unveils Blackwell successor",
+    "Amazon opens drone delivery in Texas", "Meta tests paid verification in Europe", "Netflix raises subscription prices",
+    "Samsung ships tri-fold phone", "Anthropic expands Tokyo office", "Rivian secures Volkswagen investment",
+    "Figma files for IPO", "Reddit signs data licensing deal", "SpaceX launches Starship flight test",
+    "Intel names new chief executive", "Uber partners with Waymo in Austin", "Spotify adds audiobook tier",
+    "Shopify reports quarterly earnings", "Salesforce buys Informatica",
+]
+
+
+def article(title, summary, source="TechCrunch"):
+    return {"title": title, "summary": summary, "url": f"https://example.com/{title.lower().replace(' ', '-')}", "source": source}
+
+
+def batch(*articles):
+    """The given articles plus a day's worth of unrelated stories, so
+    batch-wide boilerplate detection behaves as it does on a real fetch."""
+    return list(articles) + [
+        article(t, f"Coverage of {t.lower()} with details on timing, pricing and analyst reaction, part {i}.")
+        for i, t in enumerate(FILLER_TITLES)
+    ]
+
+
+def merged_titles(articles):
+    return [sorted(a["title"] for a in c) for c in cluster_articles(articles, CLUSTER_SIMILARITY_THRESHOLD) if len(c) > 1]
+
+
+def test_parallel_headlines_stay_apart():
+    articles = batch(
+        article("Whoop raises $100M to expand blood testing",
+                "The wearable maker will use the funding to expand its at-home blood testing service to more members."),
+        article("Oura raises $200M to expand blood testing",
+                "The smart ring maker will use the funding to expand its at-home blood testing service to more members."),
+        article("OpenAI launches new reasoning model",
+                "The company says the model is better at math and coding than its predecessors and is available today."),
+        article("Google launches new Gemini model",
+                "The company says the model is better at math and coding than its predecessors and is available today."),
+    )
+    assert merged_titles(articles) == []
+
+
+def test_same_story_from_two_outlets_still_merges():
+    articles = batch(
+        article("Whoop raises $100M to expand blood testing",
+                "The wearable maker will use the funding to expand its at-home blood testing service to more members."),
+        article("Whoop raises $100 million to expand its blood testing service",
+                "Wearable maker Whoop will use the funding to expand its at-home blood testing service to more members.",
+                source="The Verge"),
+        article("Oura raises $200M to expand blood testing",
+                "The smart ring maker will use the funding to expand its at-home blood testing service to more members."),
+    )
+    assert merged_titles(articles) == [
+        ["Whoop raises $100 million to expand its blood testing service", "Whoop raises $100M to expand blood testing"],
+    ]